@@ -1,29 +1,63 @@
 from __future__ import annotations
 
-import shutil
+from dataclasses import dataclass
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 from typing import TYPE_CHECKING
 
+import requests
 from dotenv import load_dotenv
+from pdfplumber.utils.exceptions import PdfminerException
 
+from avc.browser_pool import BROWSER_WORKERS, BrowserPool
+from avc.entry_table import EntryTable
+from avc.ledger import JobLedger, load_entry, reached
 from avc.logger import get_logger
+from avc.manifest import RunManifest, file_sha256
+from avc.matching import (
+    AMOUNT_TOLERANCE,
+    DAYS_TOLERANCE,
+    RELATIVE_AMOUNT_TOLERANCE,
+    EntryRangeIndex,
+    MatchTolerance,
+    find_entries,
+    find_entry,
+)
 from avc.models import CONTRAGENT_CATALOG
+from avc.mover import FileMover
 from avc.pdf_parser import extract_payment_order
-from avc.pyrus_client import Credentials, get_active_entries
+from avc.pipeline import Pipeline, Stage
+from avc.prefetch import PREFETCH_DEPTH, prefetch
+from avc.project_index import ProjectIndex, find_supplier_path
+from avc.pyrus_api import UPLOAD_WORKERS, PyrusApiClient, get_upload_client
+from avc.pyrus_client import (
+    Credentials,
+    TaskStateIndex,
+    get_active_entries,
+    get_order_entries,
+)
 from avc.pyrus_selenium import PyrusWebClient
+from avc.scanner import find_first_dir, scan
+from avc.storage import LocalStorage, get_storage
 from avc.utils import (
+    LOOKBACK_DAYS,
     LogWriter,
+    ProcessedTaskIndex,
     Result,
     find_project_root,
-    get_processed_tasks,
+    robot_log_path_for,
 )
 
 if TYPE_CHECKING:
-    from collections.abc import Generator
+    from collections.abc import Container, Generator, Iterable, Sequence
+    from typing import Any
 
     from avc.models import PyrusEntry
     from avc.pdf_parser import PaymentOrder
+    from avc.pyrus_api import UploadClient
+    from avc.scanner import ScanEntry
+    from avc.storage import Storage
 
 
 load_dotenv()
@@ -32,56 +66,122 @@ load_dotenv()
 logger = get_logger("avc")
 
 
-def pay_files_iter(
-    remote_path: Path, data_files_folder: Path
-) -> Generator[tuple[Path, Path]]:
-    for item in remote_path.iterdir():
-        name = item.name
-        if not (item.is_dir() and name[0].isdigit()):
+EXTRACT_WORKERS = 2
+
+
+def copy_pay_file(
+    network_file_path: Path, data_files_folder: Path, storage: Storage
+) -> Path:
+    folder = data_files_folder / network_file_path.parent.name
+    folder.mkdir(exist_ok=True, parents=True)
+    local_file_path = folder / network_file_path.name
+    storage.copy_to_local(network_file_path, local_file_path)
+    return local_file_path
+
+
+def discover_pay_files(
+    remote_path: Path,
+    storage: Storage,
+    manifest: RunManifest | None = None,
+) -> Generator[ScanEntry]:
+    deferred: list[ScanEntry] = []
+    for entry in scan(
+        remote_path,
+        max_depth=1,
+        descend=lambda e: e.name[0].isdigit(),
+        listdir=storage.listdir,
+    ):
+        if entry.is_dir or entry.depth != 1:
+            continue
+        if not entry.name.lower().endswith(".pdf"):
             continue
 
-        for network_file_path in item.glob("*.pdf"):
-            folder = data_files_folder / network_file_path.parent.name
-            folder.mkdir(exist_ok=True, parents=True)
-            local_file_path = folder / network_file_path.name
-            shutil.copy2(network_file_path, local_file_path)
-            yield network_file_path, local_file_path
+        if manifest:
+            record = manifest.unchanged(
+                Path(entry.path), entry.size, entry.mtime
+            )
+            if manifest.is_terminal(record):
+                logger.info(f"Skipping unchanged file: {entry.path!r}")
+                continue
+            if manifest.is_failed(record):
+                deferred.append(entry)
+                continue
 
+        yield entry
 
-import os
-from pathlib import Path
+    if deferred:
+        logger.info(f"Processing {len(deferred)} previously failed files")
+    yield from deferred
 
 
-def find_project_manual(projects_parent_path: Path, project_id: str, max_depth: int = 10) -> Path | None:
-    def _search_recursive(current_path: str, depth: int = 0) -> Path | None:
-        if depth > max_depth:
+def pay_files_iter(
+    remote_path: Path,
+    data_files_folder: Path,
+    storage: Storage | None = None,
+    manifest: RunManifest | None = None,
+    prefetch_depth: int = PREFETCH_DEPTH,
+) -> Generator[tuple[Path, Path, str | None]]:
+    storage = storage or LocalStorage()
+
+    def stage(entry: ScanEntry) -> tuple[Path, Path, str | None] | None:
+        network_file_path = Path(entry.path)
+        try:
+            local_file_path = copy_pay_file(
+                network_file_path, data_files_folder, storage
+            )
+        except OSError as e:
+            logger.error(f"Failed to copy {entry.path!r}: {e}")
             return None
-        # print(f"Current depth: {depth}")
+        if not manifest:
+            return network_file_path, local_file_path, None
 
-        try:
-            with os.scandir(current_path) as entries:
-                for entry in entries:
-                    if not entry.is_dir(follow_symlinks=False):
-                        continue
+        record = manifest.discover(
+            network_file_path, local_file_path, entry.size, entry.mtime
+        )
+        if manifest.is_terminal(record):
+            logger.info(f"Skipping file with unchanged content: {entry.path!r}")
+            return None
+        # The digest is passed on so the ledger does not hash the file again
+        return network_file_path, local_file_path, record["sha256"]
 
-                    if project_id in entry.name:
-                        return Path(entry.path)
+    for files in prefetch(
+        discover_pay_files(remote_path, storage, manifest),
+        stage,
+        depth=prefetch_depth,
+        size=lambda entry: entry.size,
+    ):
+        if files:
+            yield files
 
-                    result = _search_recursive(entry.path, depth + 1)
-                    if result:
-                        return result
-        except (OSError, PermissionError):
-            pass
 
-        return None
+import os
+from pathlib import Path
 
-    return _search_recursive(str(projects_parent_path))
 
+def find_project_manual(
+    projects_parent_path: Path,
+    project_id: str,
+    max_depth: int = 10,
+    storage: Storage | None = None,
+) -> Path | None:
+    storage = storage or LocalStorage()
+    return find_first_dir(
+        projects_parent_path,
+        lambda name: project_id in name,
+        max_depth=max_depth,
+        listdir=storage.listdir,
+    )
 
 
 def resolve_network_paths(
-    order: PaymentOrder, project_id: str, contragent: str, year: str
+    order: PaymentOrder,
+    project_id: str,
+    contragent: str,
+    year: str,
+    project_index: ProjectIndex | None = None,
+    storage: Storage | None = None,
 ) -> tuple[Path | None, Result]:
+    storage = storage or LocalStorage()
     projects_parent_path = Path(CONTRAGENT_CATALOG[order.payer]["folder_path"])
     if not projects_parent_path.name:
         logger.error(
@@ -104,7 +204,7 @@ def resolve_network_paths(
         )
 
     projects_parent_path = projects_parent_path / project_id_year
-    if not projects_parent_path.exists():
+    if not storage.exists(projects_parent_path):
         return None, Result(
             ok=False,
             message=f"Не найдена папка года {year} для плательщика {order.payer!r} в {projects_parent_path.as_posix()!r}",
@@ -118,7 +218,19 @@ def resolve_network_paths(
     #     logger.error(e)
     #     project_path = find_project_manual(projects_parent_path, project_id, max_depth=2)
 
-    project_path = find_project_manual(projects_parent_path, project_id, max_depth=2)
+    project_path = None
+    if project_index:
+        project_path = project_index.find_project(
+            projects_parent_path, project_id
+        )
+    if not project_path:
+        if project_index:
+            # A cached listing can miss a folder whose change did not show
+            # up in the parent mtime, search the share itself
+            logger.info(f"Project {project_id!r} not in the project index")
+        project_path = find_project_manual(
+            projects_parent_path, project_id, max_depth=2, storage=storage
+        )
 
     if not project_path:
         # project_path = projects_parent_path / project_id
@@ -134,17 +246,16 @@ def resolve_network_paths(
         )
     else:
         logger.info(f"Found folder: {project_path!r}")
-        supplier_path = next(
-            (
-                x
-                for x in project_path.rglob("*поставщик*", case_sensitive=False)
-            ),
-            None,
-        )
+        if project_index:
+            result_folder = project_index.find_finance(project_path, order.iin)
+            if result_folder:
+                logger.info(f"Found cached folder: {result_folder!r}")
+                return result_folder, Result()
+            supplier_path = project_index.find_supplier(project_path)
+        else:
+            supplier_path = find_supplier_path(project_path, storage)
         if not supplier_path:
-            logger.info(
-                f"Поставщик folder in {project_path!r} does not exist."
-            )
+            logger.info(f"Поставщик folder in {project_path!r} does not exist.")
             return None, Result(
                 ok=False,
                 message=f"Не найдена папка поставщика для плательщика {order.payer!r} в {project_path.as_posix()!r}",
@@ -153,7 +264,11 @@ def resolve_network_paths(
             logger.info(f"Found folder: {supplier_path!r}")
 
     payment_order_folder = next(
-        (x for x in supplier_path.iterdir() if order.iin in x.name.lower()),
+        (
+            supplier_path / entry.name
+            for entry in storage.listdir(supplier_path)
+            if order.iin in entry.name.lower()
+        ),
         None,
     )
 
@@ -165,12 +280,20 @@ def resolve_network_paths(
             / f"{contragent}, {order.iin}"
             / "Финансовые документы"
         )
-        logger.info(f"Folder not found. Creating it instead {result_folder.as_posix()!r}")
-        result_folder.mkdir(exist_ok=True, parents=True)
+        logger.info(
+            f"Folder not found. Creating it instead {result_folder.as_posix()!r}"
+        )
+        storage.mkdir(result_folder)
     else:
-        logger.info(f"Folder found. Attempting to find 'Финансовые документы' in {payment_order_folder.as_posix()!r}")
+        logger.info(
+            f"Folder found. Attempting to find 'Финансовые документы' in {payment_order_folder.as_posix()!r}"
+        )
         result_folder = next(
-            (x for x in payment_order_folder.iterdir() if "фин" in x.name.lower()),
+            (
+                payment_order_folder / entry.name
+                for entry in storage.listdir(payment_order_folder)
+                if "фин" in entry.name.lower()
+            ),
             None,
         )
         if not result_folder:
@@ -178,116 +301,259 @@ def resolve_network_paths(
                 f"Финансовые документы folder in {payment_order_folder.as_posix()!r} does not exist. Creating instead"
             )
             result_folder = payment_order_folder / "Финансовые документы"
-            result_folder.mkdir(exist_ok=True, parents=True)
+            storage.mkdir(result_folder)
+
+    if project_index:
+        project_index.remember_finance(project_path, order.iin, result_folder)
 
     return result_folder, Result()
 
 
-def find_entry(
-    entries: list[PyrusEntry], order: PaymentOrder
-) -> tuple[PyrusEntry | None, str | None]:
-    found_entries: list[PyrusEntry] = []
-    for entry in entries:
-        if entry.payer != order.payer:
-            continue
-        contragent_bin = entry.contragent_bin or entry.contragent_bin2
-        found = contragent_bin == order.iin and entry.amount == order.amount
-        if found:
-            found_entries.append(entry)
-
-    message = None
-    if len(found_entries) > 1:
-        logger.info("Attempting to narrow down the search...")
-        candidates = ", ".join(
-            [f"https://pyrus.com/t#id{e.task_id}" for e in found_entries]
-        )
-        message = (
-            "Невозможно определить задачу для вложения платежного поручения. "
-            f"Возможные кандидаты: {candidates}"
-        )
-        found_entries = [
-            e
-            for e in found_entries
-            if e.account_id and e.account_id in order.payment_purpose
-        ]
+@dataclass(slots=True)
+class PaymentJob:
+    network_file_path: Path
+    local_file_path: Path
+    sha256: str | None = None
+    order: PaymentOrder | None = None
+    entry: PyrusEntry | None = None
+    note: str | None = None
+    match_note: str | None = None
+    # Set when the order was matched up front in a batch
+    match: tuple[PyrusEntry | None, str | None] | None = None
+    result: Result | None = None
+    record: list[Any] | None = None
+    state: str | None = None
+    task_id: int | None = None
+
+
+def fail_job(
+    job: PaymentJob,
+    log_writer: LogWriter,
+    note: str,
+    outcome: str,
+    uploaded_to_pyrus: bool = False,
+) -> PaymentJob:
+    job.record = log_writer.build_record(
+        pdf_file_path=job.network_file_path,
+        entry=job.entry,
+        note=note,
+        found_in_pyrus=job.entry is not None,
+        uploaded_to_pyrus=uploaded_to_pyrus,
+    )
+    job.result = Result(ok=False, message=note, outcome=outcome)
+    return job
 
-    logger.info(f"Found count: {len(found_entries)}")
-    if not found_entries:
-        return None, message
 
-    found_entry = found_entries[0]
-    return found_entry, None
+def extraction_failure(job: PaymentJob, log_writer: LogWriter) -> PaymentJob:
+    network_file_path = job.network_file_path
+    note = f"Не удалось извлечь данные из {network_file_path.as_posix()!r}"
+    logger.warning(
+        f"Payment order has not been extracted: {network_file_path.as_posix()!r}"
+    )
+    return fail_job(job, log_writer, note, "extraction_failed")
+
+
+def step_failure(
+    job: PaymentJob, error: Exception, log_writer: LogWriter, step: str
+) -> PaymentJob:
+    note = f"Ошибка на этапе {step!r}: {error}"
+    file_path = job.network_file_path.as_posix()
+    logger.error(f"Step {step!r} failed for {file_path!r}: {error}")
+    return fail_job(job, log_writer, note, "step_failed")
+
+
+def discover_step(
+    job: PaymentJob, log_writer: LogWriter, ledger: JobLedger
+) -> PaymentJob:
+    if job.state is not None:
+        return job
+    if not job.sha256:
+        job.sha256 = file_sha256(job.local_file_path)
+    record = ledger.discover(job.sha256, job.network_file_path)
+    job.state = record["state"]
+    job.task_id = record["task_id"]
+    job.note = record["note"]
+    if reached(job.state, "uploaded") and record["entry"]:
+        # The task may have left the active register since it was uploaded
+        job.entry = load_entry(record["entry"])
+    if reached(job.state, "moved"):
+        note = (
+            f"Файл уже был обработан и перенесен ранее в {record['dst_path']!r}"
+        )
+        logger.warning(note)
+        return fail_job(job, log_writer, note, "already_moved")
+    return job
 
 
-def process_payment_file(
-    local_file_path: Path,
-    network_file_path: Path,
-    client: PyrusWebClient,
-    entries: list[PyrusEntry],
+def extract_step(
+    job: PaymentJob,
     log_writer: LogWriter,
     now: datetime,
-    processed_tasks: list[str],
-) -> Result:
-    order = extract_payment_order(local_file_path, now)
+    ledger: JobLedger | None = None,
+) -> PaymentJob:
+    if ledger:
+        job = discover_step(job, log_writer, ledger)
+    if job.result is not None or job.order:
+        return job
+    try:
+        job.order = extract_payment_order(job.local_file_path, now)
+    except (ValueError, PdfminerException) as e:
+        # A corrupted file or values that are not recognized, parsing it
+        # again will not help
+        logger.warning(f"Payment order has not been parsed: {e}")
+    if not job.order:
+        return extraction_failure(job, log_writer)
+    logger.info(f"Extracted order: {job.order!r}")
+    if ledger and job.sha256:
+        ledger.advance(job.sha256, "extracted")
+    return job
+
+
+def extract_jobs(
+    files: Iterable[tuple[Path, Path, str | None]],
+    log_writer: LogWriter,
+    now: datetime,
+    ledger: JobLedger | None = None,
+) -> list[PaymentJob]:
+    jobs: list[PaymentJob] = []
+    for paths in files:
+        job = PaymentJob(*paths)
+        try:
+            job = extract_step(job, log_writer, now, ledger=ledger)
+        except OSError as e:
+            # The job still reaches the log stage with its failure
+            job = step_failure(job, e, log_writer, "extract")
+        jobs.append(job)
+    return jobs
 
-    if not order:
-        note = f"Не удалось извлечь данные из {network_file_path.as_posix()!r}"
-        logger.warning(
-            f"Payment order has not been extracted: {network_file_path.as_posix()!r}"
-        )
-        log_writer.append_record(pdf_file_path=network_file_path, note=note)
-        return Result(ok=False, message=note)
-    logger.info(f"Extracted order: {order!r}")
 
-    entry, message = find_entry(entries, order)
+def match_step(
+    job: PaymentJob,
+    log_writer: LogWriter,
+    entries: Sequence[PyrusEntry],
+    processed_tasks: Container[int],
+    index: EntryRangeIndex | None = None,
+    ledger: JobLedger | None = None,
+    tolerance: MatchTolerance | None = None,
+) -> PaymentJob:
+    if job.result is not None:
+        return job
+    assert job.order, "order is None"
+
+    if job.match and (job.match[0] or job.match[1] or not tolerance):
+        entry, message = job.match
+    else:
+        entry, message = find_entry(
+            entries, job.order, index=index, tolerance=tolerance
+        )
+    if entry:
+        job.match_note = message
+    if job.task_id and (not entry or entry.task_id != job.task_id):
+        # Stick to the task the file was already uploaded to, falling back
+        # to the entry stored in the ledger once it left the register
+        entry = next(
+            (entry for entry in entries if entry.task_id == job.task_id),
+            job.entry or entry,
+        )
+        job.match_note = None
     if not entry:
         note = "Не удалось найти задачу в Pyrus для платежного поручения"
         if message:
             note += " " + message
         logger.error(note)
-        log_writer.append_record(pdf_file_path=network_file_path, note=note)
-        return Result(ok=False, message=note)
+        return fail_job(job, log_writer, note, "entry_not_found")
     logger.info(f"Found entry: {entry!r}")
+    job.entry = entry
 
     url = f"https://pyrus.com/t#id{entry.task_id}"
     logger.info(f"Found entry: {url}")
-    if url in processed_tasks:
+    if ledger and job.sha256:
+        ledger.advance(
+            job.sha256, "matched", task_id=entry.task_id, entry=entry
+        )
+    if reached(job.state, "uploaded"):
+        return job
+    if entry.task_id in processed_tasks:
         logger.info("Previously uploaded task, skipping")
-        return Result()
+        job.result = Result()
+    return job
+
+
+def upload_step(
+    job: PaymentJob,
+    client: UploadClient,
+    ledger: JobLedger | None = None,
+    processed_tasks: ProcessedTaskIndex | None = None,
+    task_states: TaskStateIndex | None = None,
+) -> PaymentJob:
+    if job.result is not None:
+        return job
+    assert job.entry, "entry is None"
+
+    if reached(job.state, "uploaded"):
+        logger.info(
+            f"File has already been uploaded to task {job.entry.task_id}, skipping upload"
+        )
+        return job
 
     # # TODO: Use only when testing
-    # log_writer.append_record(
-    #     pdf_file_path=network_file_path,
-    #     entry=entry,
-    #     found_in_pyrus=True,
-    #     uploaded_to_pyrus=False,
-    #     moved_file=True,
-    #     note="Успех",
-    # )
-    # return Result()
-
-    note = client.upload_file(
-        task_id=entry.task_id,
-        file_path=local_file_path,
-    )
+    # job.note = None
+    # return job
+
+    if task_states is not None and task_states.is_attached(
+        job.entry.task_id, job.local_file_path
+    ):
+        # A second copy would be attached, approval is left to a person
+        logger.info(
+            f"File is already attached to task {job.entry.task_id}, skipping upload"
+        )
+        job.note = "Загрузка файла: файл уже прикреплен к задаче\n"
+    else:
+        job.note = client.upload_file(
+            task_id=job.entry.task_id,
+            file_path=job.local_file_path,
+        )
+    if processed_tasks is not None:
+        processed_tasks.add(job.entry.task_id)
+    if ledger and job.sha256:
+        ledger.advance(
+            job.sha256,
+            "uploaded" if job.note else "approved",
+            note=job.note,
+        )
+    return job
+
+
+def relocate_step(
+    job: PaymentJob,
+    log_writer: LogWriter,
+    now: datetime,
+    project_index: ProjectIndex | None = None,
+    storage: Storage | None = None,
+    mover: FileMover | None = None,
+    ledger: JobLedger | None = None,
+) -> PaymentJob:
+    if job.result is not None:
+        return job
+    storage = storage or LocalStorage()
+    order, entry, note = job.order, job.entry, job.note
+    network_file_path = job.network_file_path
+    assert order and entry, "order or entry is None"
 
     if not entry.project_id:
         note = f"{note or ''}Задача без № проекта. Конечный путь для переноса файла неизвестен"
         logger.error(note)
-        log_writer.append_record(
-            pdf_file_path=network_file_path,
-            entry=entry,
-            note=note,
-            found_in_pyrus=True,
-            uploaded_to_pyrus=True,
+        return fail_job(
+            job, log_writer, note, "no_project_id", uploaded_to_pyrus=True
         )
-        return Result(ok=False, message=note)
 
     payment_order_folder, result = resolve_network_paths(
         order,
         project_id=entry.project_id,
         contragent=entry.contragent or order.benificiary,
-        year=str(now.year)
+        year=str(now.year),
+        project_index=project_index,
+        storage=storage,
     )
     if not result:
         note = (
@@ -295,14 +561,9 @@ def process_payment_file(
             or "Не найдена папка для плательщика {order.payer!r} в 'N:/Общие диски'"
         )
         logger.error(note)
-        log_writer.append_record(
-            pdf_file_path=network_file_path,
-            entry=entry,
-            note=note,
-            found_in_pyrus=True,
-            uploaded_to_pyrus=True,
+        return fail_job(
+            job, log_writer, note, "folder_not_found", uploaded_to_pyrus=True
         )
-        return Result(ok=False, message=note)
 
     assert payment_order_folder, "payment_order_folder is None"
 
@@ -310,19 +571,100 @@ def process_payment_file(
         f"Attempting to move {network_file_path.name!r} to {payment_order_folder.as_posix()!r}"
     )
     dst_path = payment_order_folder / network_file_path.name
-    shutil.move(network_file_path, dst_path)
+    log_note = note or "Успех"
+    if job.match_note:
+        log_note = f"{log_note.rstrip()}. {job.match_note}"
+    if mover:
+        record = log_writer.build_record(
+            pdf_file_path=network_file_path,
+            entry=entry,
+            found_in_pyrus=True,
+            uploaded_to_pyrus=not note,
+            note=log_note,
+        )
+        mover.submit(network_file_path, dst_path, record, key=job.sha256)
+        job.result = Result()
+        return job
+
+    storage.move(network_file_path, dst_path)
     logger.info(f"File moved: {dst_path.as_posix()!r}")
+    if ledger and job.sha256:
+        ledger.advance(job.sha256, "moved", dst_path=dst_path)
 
-    log_writer.append_record(
+    job.record = log_writer.build_record(
         pdf_file_path=dst_path,
         entry=entry,
         found_in_pyrus=True,
-        uploaded_to_pyrus=True if not note else False,
+        uploaded_to_pyrus=not note,
         moved_file=True,
-        note=note or "Успех",
+        note=log_note,
     )
+    job.result = Result()
+    return job
 
-    return Result()
+
+def log_step(
+    job: PaymentJob,
+    log_writer: LogWriter,
+    manifest: RunManifest | None = None,
+) -> None:
+    if job.record:
+        log_writer.write_record(job.record)
+    result = job.result if job.result is not None else Result()
+    if manifest:
+        manifest.record(job.network_file_path, result)
+    logger.info(f"Result for {job.network_file_path.name!r}: {result!r}")
+
+
+def process_payment_file(
+    local_file_path: Path,
+    network_file_path: Path,
+    client: UploadClient,
+    entries: Sequence[PyrusEntry],
+    log_writer: LogWriter,
+    now: datetime,
+    processed_tasks: Container[int],
+    index: EntryRangeIndex | None = None,
+    tolerance: MatchTolerance | None = None,
+    order: PaymentOrder | None = None,
+    project_index: ProjectIndex | None = None,
+    storage: Storage | None = None,
+    mover: FileMover | None = None,
+    ledger: JobLedger | None = None,
+) -> Result:
+    job = PaymentJob(network_file_path, local_file_path, order=order)
+    job = extract_step(job, log_writer, now, ledger=ledger)
+    job = match_step(
+        job,
+        log_writer,
+        entries,
+        processed_tasks,
+        index,
+        ledger=ledger,
+        tolerance=tolerance,
+    )
+    job = upload_step(
+        job,
+        client,
+        ledger=ledger,
+        processed_tasks=(
+            processed_tasks
+            if isinstance(processed_tasks, ProcessedTaskIndex)
+            else None
+        ),
+    )
+    job = relocate_step(
+        job,
+        log_writer,
+        now,
+        project_index,
+        storage=storage,
+        mover=mover,
+        ledger=ledger,
+    )
+    if job.record:
+        log_writer.write_record(job.record)
+    return job.result if job.result is not None else Result()
 
 
 def run(project_folder: Path | None = None) -> None:
@@ -330,7 +672,8 @@ def run(project_folder: Path | None = None) -> None:
 
     remote_path = Path(os.environ["REMOTE_PATH"]) / "F. Платежи"
     logger.info(f"Using remote path: {remote_path.as_posix()!r}")
-    if not remote_path.exists():
+    storage = get_storage()
+    if not storage.exists(remote_path):
         logger.error("Network drive is not attached")
         return
 
@@ -349,14 +692,16 @@ def run(project_folder: Path | None = None) -> None:
         data_folder / "files" / now.strftime("%Y-%m") / now.strftime("%d-%m-%Y")
     )
     data_files_folder.mkdir(exist_ok=True, parents=True)
-    robot_log_path = (
-        data_folder
-        / "logs"
-        / now.strftime("%Y-%m")
-        / f"{now.strftime('%Y.%m.%d')}.csv"
+    robot_log_path = robot_log_path_for(data_folder / "logs", now.date())
+
+    processed_tasks = ProcessedTaskIndex(
+        data_folder / "processed_tasks.txt",
+        today=now.date(),
+        lookback_days=int(
+            os.environ.get("PROCESSED_LOOKBACK_DAYS", LOOKBACK_DAYS)
+        ),
     )
-
-    processed_tasks = get_processed_tasks(robot_log_path)
+    processed_tasks.seed_from_logs(data_folder / "logs")
 
     creds = Credentials(
         email=os.environ["PYRUS_EMAIL"],
@@ -364,31 +709,195 @@ def run(project_folder: Path | None = None) -> None:
         person_id=int(os.environ["PYRUS_PERSON_ID"]),
     )
     logger.info(f"Using Pyrus account: {creds.email!r}")
+    # One login serves the register requests, the uploads and the browser
+    session = requests.Session()
+
+    browser_workers = int(os.environ.get("BROWSER_WORKERS", BROWSER_WORKERS))
+    browser_mode = os.environ.get("BROWSER_MODE", "full")
+    web_client: PyrusWebClient | BrowserPool
+    profiles_folder = data_folder / "chrome-profiles"
+    if browser_workers > 1:
+        web_client = BrowserPool(
+            lambda idx: PyrusWebClient(
+                driver_path=driver_path,
+                chrome_path=chrome_path,
+                profile_dir=profiles_folder / f"worker-{idx}",
+                mode=browser_mode,
+                session=session,
+            ),
+            size=browser_workers,
+        )
+    else:
+        web_client = PyrusWebClient(
+            driver_path=driver_path,
+            chrome_path=chrome_path,
+            profile_dir=profiles_folder / "main",
+            mode=browser_mode,
+            session=session,
+        )
+    client = get_upload_client(creds, web_client, session=session)
+    log_writer = LogWriter(
+        robot_log_path, publish_folder=remote_path / "Логи", storage=storage
+    )
+    project_index = ProjectIndex(
+        data_folder / "project_index.json", storage=storage
+    )
+    manifest = RunManifest(data_folder / "manifest.json")
+    ledger = JobLedger(data_folder / "ledger.sqlite3")
 
-    client = PyrusWebClient(driver_path=driver_path, chrome_path=chrome_path)
-    log_writer = LogWriter(robot_log_path)
+    def on_moved(sha256: str, dst_path: Path) -> None:
+        ledger.advance(sha256, "moved", dst_path=dst_path)
 
-    entries = get_active_entries(creds=creds)
+    mover = FileMover(
+        data_folder / "move_queue.json",
+        log_writer=log_writer,
+        storage=storage,
+        on_moved=on_moved,
+    )
 
-    with client, log_writer:
-        client.login()
+    # Near-miss matching is opt-in, exact matches are always tried first
+    tolerance: MatchTolerance | None = None
+    match_mode = os.environ.get("MATCH_MODE", "exact")
+    logger.info(f"Using match mode: {match_mode!r}")
+    if match_mode == "tolerant":
+        days = os.environ.get("DAYS_TOLERANCE", str(DAYS_TOLERANCE))
+        tolerance = MatchTolerance(
+            amount=float(os.environ.get("AMOUNT_TOLERANCE", AMOUNT_TOLERANCE)),
+            relative_amount=float(
+                os.environ.get(
+                    "RELATIVE_AMOUNT_TOLERANCE", RELATIVE_AMOUNT_TOLERANCE
+                )
+            ),
+            days=int(days) if days else None,
+        )
 
-        for idx, (network_file_path, local_file_path) in enumerate(
-            pay_files_iter(remote_path, data_files_folder)
-        ):
-            logger.info(
-                f"#{idx:02} processing file: {local_file_path.as_posix()!r}"
+    # A single browser is driven from the main thread, HTTP uploads and
+    # browser pool workers can run side by side
+    upload_workers = 1
+    if isinstance(client, PyrusApiClient):
+        upload_workers = int(os.environ.get("UPLOAD_WORKERS", UPLOAD_WORKERS))
+    elif isinstance(client, BrowserPool):
+        upload_workers = client.size
+
+    with (
+        storage,
+        session,
+        client,
+        log_writer,
+        project_index,
+        manifest,
+        ledger,
+        mover,
+    ):
+        fetch_mode = os.environ.get("FETCH_MODE", "full")
+        logger.info(f"Using fetch mode: {fetch_mode!r}")
+
+        files = pay_files_iter(
+            remote_path, data_files_folder, storage=storage, manifest=manifest
+        )
+        # Attachments of each task, taken from the register as it is fetched
+        task_states = TaskStateIndex()
+        jobs: Iterable[PaymentJob]
+        if fetch_mode == "adaptive":
+            jobs = extract_jobs(files, log_writer, now, ledger=ledger)
+            orders = [job.order for job in jobs if job.order]
+            # The register stays in memory for the whole run, keep it columnar
+            entries = EntryTable(
+                get_order_entries(
+                    creds=creds,
+                    orders=orders,
+                    session=session,
+                    task_states=task_states,
+                )
             )
-            result = process_payment_file(
-                local_file_path=local_file_path,
-                network_file_path=network_file_path,
-                client=client,
-                entries=entries,
-                log_writer=log_writer,
-                now=now,
-                processed_tasks=processed_tasks,
+            # Every order is known up front, join them in one vectorized pass
+            matches = iter(find_entries(entries, orders))
+            for job in jobs:
+                if job.order:
+                    job.match = next(matches)
+        else:
+            jobs = (PaymentJob(*paths) for paths in files)
+            entries = EntryTable(
+                get_active_entries(
+                    creds=creds, session=session, task_states=task_states
+                )
             )
-            logger.info(f"Result: {result!r}")
+        index = EntryRangeIndex(entries)
+
+        pipeline = Pipeline(
+            [
+                Stage(
+                    "extract",
+                    partial(
+                        extract_step,
+                        log_writer=log_writer,
+                        now=now,
+                        ledger=ledger,
+                    ),
+                    workers=EXTRACT_WORKERS,
+                    on_error=partial(
+                        step_failure, log_writer=log_writer, step="extract"
+                    ),
+                ),
+                Stage(
+                    "match",
+                    partial(
+                        match_step,
+                        log_writer=log_writer,
+                        entries=entries,
+                        processed_tasks=processed_tasks,
+                        index=index,
+                        tolerance=tolerance,
+                        ledger=ledger,
+                    ),
+                    on_error=partial(
+                        step_failure, log_writer=log_writer, step="match"
+                    ),
+                ),
+                Stage(
+                    "upload",
+                    partial(
+                        upload_step,
+                        client=client,
+                        ledger=ledger,
+                        processed_tasks=processed_tasks,
+                        task_states=task_states,
+                    ),
+                    workers=upload_workers,
+                    inline=isinstance(client, PyrusWebClient),
+                    on_error=partial(
+                        step_failure, log_writer=log_writer, step="upload"
+                    ),
+                ),
+                Stage(
+                    "relocate",
+                    partial(
+                        relocate_step,
+                        log_writer=log_writer,
+                        now=now,
+                        project_index=project_index,
+                        storage=storage,
+                        mover=mover,
+                        ledger=ledger,
+                    ),
+                    on_error=partial(
+                        step_failure, log_writer=log_writer, step="relocate"
+                    ),
+                ),
+                Stage(
+                    "log",
+                    partial(log_step, log_writer=log_writer, manifest=manifest),
+                    ordered=True,
+                ),
+            ]
+        )
+
+        client.login()
+        pipeline.run(jobs)
+
+        mover.join()
+        for network_file_path, result in mover.failed:
+            manifest.record(network_file_path, result)
 
 
 if __name__ == "__main__":
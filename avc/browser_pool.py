@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, NamedTuple
+
+from selenium.common.exceptions import WebDriverException
+
+from avc.logger import get_logger
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+    from types import TracebackType
+    from typing import Self
+
+    from avc.pyrus_selenium import PyrusWebClient
+
+logger = get_logger("avc")
+
+
+BROWSER_WORKERS = 1
+MAX_RESTARTS = 3
+
+
+class UploadJob(NamedTuple):
+    task_id: int
+    file_path: Path
+    future: Future[str | None]
+
+
+class BrowserWorker:
+    def __init__(
+        self,
+        idx: int,
+        factory: Callable[[int], PyrusWebClient],
+        jobs: queue.Queue[UploadJob | None],
+        max_restarts: int = MAX_RESTARTS,
+    ) -> None:
+        self.idx: int = idx
+        self.factory: Callable[[int], PyrusWebClient] = factory
+        self.jobs: queue.Queue[UploadJob | None] = jobs
+        self.max_restarts: int = max_restarts
+
+        self.client: PyrusWebClient | None = None
+        self.ready: threading.Event = threading.Event()
+        self.thread: threading.Thread = threading.Thread(
+            target=self.run, name=f"browser-{idx}", daemon=True
+        )
+
+        self.processed: int = 0
+        self.failed: int = 0
+        self.restarts: int = 0
+        self.busy: float = 0.0
+        self.started_at: float = time.perf_counter()
+
+    def start_client(self) -> PyrusWebClient:
+        client = self.factory(self.idx)
+        client.login()
+        logger.info(f"Browser worker {self.idx} logged in")
+        return client
+
+    def stop_client(self) -> None:
+        if not self.client:
+            return
+        try:
+            self.client.__exit__(None, None, None)
+        except WebDriverException as e:
+            logger.debug(f"Browser worker {self.idx} quit failed: {e}")
+        self.client = None
+
+    def restart(self) -> bool:
+        if self.restarts >= self.max_restarts:
+            logger.error(
+                f"Browser worker {self.idx} exceeded {self.max_restarts} restarts"
+            )
+            return False
+        self.restarts += 1
+        logger.warning(
+            f"Restarting browser worker {self.idx} ({self.restarts}/{self.max_restarts})"
+        )
+        self.stop_client()
+        try:
+            self.client = self.start_client()
+        except WebDriverException as e:
+            logger.error(f"Browser worker {self.idx} failed to start: {e}")
+            return False
+        return True
+
+    def healthy(self) -> bool:
+        if self.client and self.client.is_driver_running():
+            return True
+        return self.restart()
+
+    def run(self) -> None:
+        try:
+            self.client = self.start_client()
+        except Exception:
+            logger.exception(f"Browser worker {self.idx} failed to start")
+        finally:
+            self.ready.set()
+
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            if not self.healthy():
+                # Leave the job to the other workers
+                self.jobs.put(job)
+                break
+
+            task_id, file_path, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            started_at = time.perf_counter()
+            try:
+                assert self.client, "client is None"
+                note = self.client.upload_file(
+                    task_id=task_id, file_path=file_path
+                )
+            except WebDriverException as e:
+                # Not retried, the file may already be attached. The driver
+                # is checked and restarted before the next job
+                logger.error(f"Browser worker {self.idx} crashed: {e}")
+                self.failed += 1
+                future.set_exception(e)
+            except Exception as e:
+                # The caller gets the error, only the trace is kept here
+                logger.debug(
+                    f"Browser worker {self.idx} failed on task {task_id}",
+                    exc_info=True,
+                )
+                self.failed += 1
+                future.set_exception(e)
+            else:
+                self.processed += 1
+                future.set_result(note)
+            finally:
+                self.busy += time.perf_counter() - started_at
+
+        self.stop_client()
+
+    def report(self) -> str:
+        elapsed = time.perf_counter() - self.started_at
+        rate = self.processed / elapsed * 60 if elapsed else 0.0
+        return (
+            f"browser-{self.idx}: {self.processed} uploaded, "
+            f"{self.failed} failed, {self.restarts} restarts, "
+            f"busy {self.busy:.1f}s, {rate:.1f}/min"
+        )
+
+
+class BrowserPool:
+    def __init__(
+        self,
+        factory: Callable[[int], PyrusWebClient],
+        size: int = BROWSER_WORKERS,
+        max_restarts: int = MAX_RESTARTS,
+    ) -> None:
+        self.size: int = size
+        self._jobs: queue.Queue[UploadJob | None] = queue.Queue()
+        self.workers: list[BrowserWorker] = [
+            BrowserWorker(idx, factory, self._jobs, max_restarts)
+            for idx in range(size)
+        ]
+
+    def login(self) -> None:
+        for worker in self.workers:
+            worker.thread.start()
+        for worker in self.workers:
+            worker.ready.wait()
+
+        if not any(worker.client for worker in self.workers):
+            raise RuntimeError("No browser worker could be started")
+
+    def upload_file(self, task_id: int, file_path: Path) -> str | None:
+        future: Future[str | None] = Future()
+        self._jobs.put(UploadJob(task_id, file_path, future))
+        while True:
+            try:
+                return future.result(timeout=5)
+            except TimeoutError:
+                if not any(w.thread.is_alive() for w in self.workers):
+                    raise RuntimeError("All browser workers have stopped")
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        _: type[BaseException] | None,
+        __: BaseException | None,
+        ___: TracebackType | None,
+    ) -> bool:
+        for _worker in self.workers:
+            self._jobs.put(None)
+        for worker in self.workers:
+            if worker.thread.is_alive():
+                worker.thread.join()
+        logger.info("Browser pool throughput:")
+        for worker in self.workers:
+            logger.info(worker.report())
+        return False
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+from array import array
+from collections.abc import Sequence
+from datetime import datetime
+from typing import TYPE_CHECKING, overload, override
+
+from avc.models import PyrusEntry
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from typing import Any
+
+
+MISSING = -(2**63)
+
+INT_FIELDS = ("task_id", "initiator_id")
+AMOUNT_FIELDS = ("amount",)
+DATE_FIELDS = ("invoice_date", "desired_date")
+STRING_FIELDS = tuple(
+    name
+    for name in PyrusEntry._fields
+    if name not in INT_FIELDS + AMOUNT_FIELDS + DATE_FIELDS
+)
+
+
+class StringColumn:
+    __slots__: tuple[str, ...] = ("_lookup", "codes", "values")
+
+    def __init__(self) -> None:
+        self.values: list[str | None] = [None]
+        self.codes: array[int] = array("I")
+        self._lookup: dict[str | None, int] = {None: 0}
+
+    def append(self, value: str | None) -> None:
+        code = self._lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self._lookup[value] = code
+        self.codes.append(code)
+
+    def __getitem__(self, idx: int) -> str | None:
+        return self.values[self.codes[idx]]
+
+
+class EntryRow:
+    __slots__: tuple[str, ...] = ("_idx", "_table")
+
+    _fields: tuple[str, ...] = PyrusEntry._fields
+
+    def __init__(self, table: EntryTable, idx: int) -> None:
+        self._table: EntryTable = table
+        self._idx: int = idx
+
+    def __getattr__(self, name: str) -> Any:
+        return self._table.value(name, self._idx)
+
+    def _asdict(self) -> dict[str, Any]:
+        return {
+            name: self._table.value(name, self._idx) for name in self._fields
+        }
+
+    def to_entry(self) -> PyrusEntry:
+        return PyrusEntry(**self._asdict())
+
+    @override
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, EntryRow):
+            return self._asdict() == other._asdict()
+        if isinstance(other, PyrusEntry):
+            return self.to_entry() == other
+        return NotImplemented
+
+    @override
+    def __hash__(self) -> int:
+        return hash(self.to_entry())
+
+    @override
+    def __repr__(self) -> str:
+        return repr(self.to_entry()).replace("PyrusEntry", "EntryRow", 1)
+
+
+class EntryTable(Sequence[PyrusEntry]):
+    def __init__(self, entries: Iterable[PyrusEntry] = ()) -> None:
+        self._ints: dict[str, array[int]] = {
+            name: array("q") for name in INT_FIELDS
+        }
+        self._amounts: dict[str, array[int]] = {
+            name: array("q") for name in AMOUNT_FIELDS
+        }
+        self._dates: dict[str, array[int]] = {
+            name: array("q") for name in DATE_FIELDS
+        }
+        self._strings: dict[str, StringColumn] = {
+            name: StringColumn() for name in STRING_FIELDS
+        }
+        self._size: int = 0
+
+        self.extend(entries)
+
+    def append(self, entry: PyrusEntry) -> None:
+        for name, column in self._ints.items():
+            column.append(getattr(entry, name))
+        for name, column in self._amounts.items():
+            amount = getattr(entry, name)
+            cents = MISSING if amount is None else round(amount * 100)
+            column.append(cents)
+        for name, column in self._dates.items():
+            dt = getattr(entry, name)
+            ts = MISSING if dt is None else round(dt.timestamp() * 1000)
+            column.append(ts)
+        for name, column in self._strings.items():
+            column.append(getattr(entry, name))
+        self._size += 1
+
+    def extend(self, entries: Iterable[PyrusEntry]) -> None:
+        for entry in entries:
+            self.append(entry)
+
+    def value(self, name: str, idx: int) -> Any:
+        if name in self._strings:
+            return self._strings[name][idx]
+        if name in self._ints:
+            return self._ints[name][idx]
+        if name in self._amounts:
+            amount = self._amounts[name][idx]
+            return None if amount == MISSING else amount / 100
+        if name in self._dates:
+            ts = self._dates[name][idx]
+            if ts == MISSING:
+                return None
+            return datetime.fromtimestamp(ts / 1000)
+        raise AttributeError(name)
+
+    def column(self, name: str) -> list[Any]:
+        return [self.value(name, idx) for idx in range(self._size)]
+
+    def entry(self, idx: int) -> PyrusEntry:
+        return PyrusEntry(
+            *(self.value(name, idx) for name in PyrusEntry._fields)
+        )
+
+    def row(self, idx: int) -> EntryRow:
+        return EntryRow(self, self._check_index(idx))
+
+    def rows(self) -> Iterator[EntryRow]:
+        for idx in range(self._size):
+            yield EntryRow(self, idx)
+
+    def to_entries(self) -> list[PyrusEntry]:
+        return list(self)
+
+    def _check_index(self, idx: int) -> int:
+        if idx < 0:
+            idx += self._size
+        if not 0 <= idx < self._size:
+            raise IndexError("EntryTable index out of range")
+        return idx
+
+    @override
+    def __len__(self) -> int:
+        return self._size
+
+    @overload
+    def __getitem__(self, idx: int) -> PyrusEntry: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> list[PyrusEntry]: ...
+
+    @override
+    def __getitem__(self, idx: int | slice) -> PyrusEntry | list[PyrusEntry]:
+        if isinstance(idx, slice):
+            return [self.entry(i) for i in range(*idx.indices(self._size))]
+        return self.entry(self._check_index(idx))
+
+    @override
+    def __iter__(self) -> Iterator[PyrusEntry]:
+        for idx in range(self._size):
+            yield self.entry(idx)
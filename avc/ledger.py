@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, TypedDict
+
+from avc.logger import get_logger
+from avc.models import PyrusEntry
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from types import TracebackType
+    from typing import Self
+
+logger = get_logger("avc")
+
+
+STATES = ("discovered", "extracted", "matched", "uploaded", "approved", "moved")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    sha256 TEXT PRIMARY KEY,
+    network_path TEXT NOT NULL,
+    state TEXT NOT NULL,
+    task_id INTEGER,
+    note TEXT,
+    dst_path TEXT,
+    updated_at TEXT NOT NULL,
+    entry TEXT
+);
+CREATE TABLE IF NOT EXISTS transitions (
+    sha256 TEXT NOT NULL,
+    state TEXT NOT NULL,
+    at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transitions_sha256 ON transitions (sha256);
+"""
+
+DISCOVER_JOB = """
+INSERT OR IGNORE INTO jobs (sha256, network_path, state, updated_at)
+VALUES (?, ?, 'discovered', ?)
+"""
+
+ADVANCE_JOB = """
+UPDATE jobs SET
+    state = ?,
+    task_id = COALESCE(?, task_id),
+    note = COALESCE(?, note),
+    dst_path = COALESCE(?, dst_path),
+    entry = COALESCE(?, entry),
+    updated_at = ?
+WHERE sha256 = ?
+"""
+
+
+class LedgerRecordT(TypedDict):
+    sha256: str
+    network_path: str
+    state: str
+    task_id: int | None
+    note: str | None
+    dst_path: str | None
+    updated_at: str
+    entry: str | None
+
+
+def reached(state: str | None, target: str) -> bool:
+    if state is None:
+        return False
+    return STATES.index(state) >= STATES.index(target)
+
+
+DATE_FIELDS = ("invoice_date", "desired_date")
+
+
+def dump_entry(entry: PyrusEntry) -> str:
+    data = entry._asdict()
+    for name in DATE_FIELDS:
+        if data[name] is not None:
+            data[name] = data[name].isoformat()
+    return json.dumps(data, ensure_ascii=False)
+
+
+def load_entry(raw: str) -> PyrusEntry:
+    data = json.loads(raw)
+    for name in DATE_FIELDS:
+        if data[name] is not None:
+            data[name] = datetime.fromisoformat(data[name])
+    return PyrusEntry(**data)
+
+
+class JobLedger:
+    def __init__(self, db_path: Path) -> None:
+        self.db_path: Path = db_path
+        self.db_path.parent.mkdir(exist_ok=True, parents=True)
+
+        self._lock: threading.Lock = threading.Lock()
+        self._conn: sqlite3.Connection = sqlite3.connect(
+            db_path, check_same_thread=False
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        columns = {
+            row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")
+        }
+        if "entry" not in columns:
+            # Ledgers written before entries were stored
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN entry TEXT")
+
+    def get(self, sha256: str) -> LedgerRecordT | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+        return LedgerRecordT(**row) if row else None
+
+    def discover(self, sha256: str, network_path: Path) -> LedgerRecordT:
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                DISCOVER_JOB, (sha256, str(network_path), now)
+            )
+            if cursor.rowcount:
+                self._conn.execute(
+                    "INSERT INTO transitions VALUES (?, 'discovered', ?)",
+                    (sha256, now),
+                )
+        record = self.get(sha256)
+        assert record, "ledger record is None"
+        if record["state"] != "discovered":
+            logger.info(
+                f"Resuming {network_path.name!r} from state {record['state']!r}"
+            )
+        return record
+
+    def advance(
+        self,
+        sha256: str,
+        state: str,
+        task_id: int | None = None,
+        note: str | None = None,
+        dst_path: Path | None = None,
+        entry: PyrusEntry | None = None,
+    ) -> bool:
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT state FROM jobs WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+            if not row or reached(row["state"], state):
+                return False
+            self._conn.execute(
+                ADVANCE_JOB,
+                (
+                    state,
+                    task_id,
+                    note,
+                    str(dst_path) if dst_path else None,
+                    dump_entry(entry) if entry else None,
+                    now,
+                    sha256,
+                ),
+            )
+            self._conn.execute(
+                "INSERT INTO transitions VALUES (?, ?, ?)", (sha256, state, now)
+            )
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        _: type[BaseException] | None,
+        __: BaseException | None,
+        ___: TracebackType | None,
+    ) -> bool:
+        self.close()
+        return False
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, TypedDict
+
+from avc.logger import get_logger
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from types import TracebackType
+    from typing import Self
+
+    from avc.utils import Result
+
+logger = get_logger("avc")
+
+
+TERMINAL_OUTCOMES = {"extraction_failed", "already_moved"}
+RETENTION_DAYS = 30
+
+
+class ManifestRecordT(TypedDict):
+    size: int
+    mtime: float
+    sha256: str | None
+    ok: bool | None
+    outcome: str | None
+    updated_at: str
+
+
+def file_sha256(file_path: Path) -> str:
+    digest = hashlib.sha256()
+    with file_path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RunManifest:
+    def __init__(self, file_path: Path) -> None:
+        self.file_path: Path = file_path
+        self._records: dict[str, ManifestRecordT] = {}
+        self._seen: set[str] = set()
+        self._lock: threading.Lock = threading.Lock()
+
+        self.load()
+
+    def load(self) -> None:
+        if not self.file_path.exists():
+            return
+        try:
+            with self.file_path.open("r", encoding="utf-8") as f:
+                self._records = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load run manifest: {e}")
+            self._records = {}
+
+    def save(self) -> None:
+        expired = datetime.now() - timedelta(days=RETENTION_DAYS)
+        expired = expired.isoformat()
+        with self._lock:
+            records = {
+                path: record
+                for path, record in self._records.items()
+                if record["outcome"] != "success"
+                and (path in self._seen or record["updated_at"] > expired)
+            }
+        self.file_path.parent.mkdir(exist_ok=True, parents=True)
+        tmp_path = self.file_path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        tmp_path.replace(self.file_path)
+
+    def unchanged(
+        self, network_file_path: Path, size: int, mtime: float
+    ) -> ManifestRecordT | None:
+        key = str(network_file_path)
+        with self._lock:
+            self._seen.add(key)
+            record = self._records.get(key)
+        if not record:
+            return None
+        if record["size"] != size or record["mtime"] != mtime:
+            return None
+        return record
+
+    def is_terminal(self, record: ManifestRecordT | None) -> bool:
+        return bool(record) and record["outcome"] in TERMINAL_OUTCOMES
+
+    def is_failed(self, record: ManifestRecordT | None) -> bool:
+        return bool(record) and record["ok"] is False
+
+    def discover(
+        self,
+        network_file_path: Path,
+        local_file_path: Path,
+        size: int,
+        mtime: float,
+    ) -> ManifestRecordT:
+        key = str(network_file_path)
+        sha256 = file_sha256(local_file_path)
+
+        with self._lock:
+            self._seen.add(key)
+            record = self._records.get(key)
+            if record and record["sha256"] == sha256:
+                record["size"] = size
+                record["mtime"] = mtime
+                return record
+
+            record = ManifestRecordT(
+                size=size,
+                mtime=mtime,
+                sha256=sha256,
+                ok=None,
+                outcome=None,
+                updated_at=datetime.now().isoformat(),
+            )
+            self._records[key] = record
+            return record
+
+    def record(self, network_file_path: Path, result: Result) -> None:
+        with self._lock:
+            record = self._records.get(str(network_file_path))
+            if not record:
+                return
+            record["ok"] = result.ok
+            record["outcome"] = result.outcome if not result.ok else "success"
+            record["updated_at"] = datetime.now().isoformat()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        _: type[BaseException] | None,
+        __: BaseException | None,
+        ___: TracebackType | None,
+    ) -> bool:
+        try:
+            self.save()
+        except OSError:
+            logger.exception(f"Failed to save {self.file_path}")
+        return False
@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import TYPE_CHECKING, NamedTuple
+
+from avc.logger import get_logger
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    import pandas as pd
+
+    from avc.models import PyrusEntry
+    from avc.pdf_parser import PaymentOrder
+
+    Match = tuple[PyrusEntry | None, str | None]
+
+logger = get_logger("avc")
+
+
+AMOUNT_TOLERANCE = 0.01
+RELATIVE_AMOUNT_TOLERANCE = 0.0
+DAYS_TOLERANCE = 7
+
+
+class MatchTolerance(NamedTuple):
+    amount: float = AMOUNT_TOLERANCE
+    relative_amount: float = RELATIVE_AMOUNT_TOLERANCE
+    days: int | None = DAYS_TOLERANCE
+
+
+class Candidate(NamedTuple):
+    entry: PyrusEntry
+    amount_delta: float
+    days_delta: float | None
+
+
+class AccountIdAutomaton:
+    def __init__(self, entries: Sequence[PyrusEntry]) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[str]] = [[]]
+        self._tasks: dict[str, list[int]] = {}
+
+        for entry in entries:
+            if not entry.account_id:
+                continue
+            if entry.account_id not in self._tasks:
+                self._add(entry.account_id)
+                self._tasks[entry.account_id] = []
+            self._tasks[entry.account_id].append(entry.task_id)
+
+        self._build()
+
+    def _add(self, pattern: str) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._out[state].append(pattern)
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                self._out[next_state].extend(self._out[fail])
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def search(self, text: str | None) -> set[str]:
+        found: set[str] = set()
+        if not text or not self._tasks:
+            return found
+
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            found.update(self._out[state])
+        return found
+
+    def tasks(self, text: str | None) -> set[int]:
+        return {
+            task_id
+            for account_id in self.search(text)
+            for task_id in self._tasks[account_id]
+        }
+
+
+class EntryRangeIndex:
+    def __init__(self, entries: Sequence[PyrusEntry]) -> None:
+        self.automaton: AccountIdAutomaton = AccountIdAutomaton(entries)
+        # Rows are kept as positions, an EntryTable builds only the
+        # entries that fall into a searched range
+        self._source: Sequence[PyrusEntry] = entries
+
+        by_payer: dict[str, list[tuple[float, int]]] = {}
+        for row, entry in enumerate(entries):
+            if entry.amount is None:
+                continue
+            by_payer.setdefault(entry.payer, []).append((entry.amount, row))
+
+        self._amounts: dict[str, array[float]] = {}
+        self._rows: dict[str, array[int]] = {}
+        for payer, payer_rows in by_payer.items():
+            payer_rows.sort(key=lambda item: item[0])
+            self._amounts[payer] = array("d", (a for a, _ in payer_rows))
+            self._rows[payer] = array("q", (row for _, row in payer_rows))
+
+    def __len__(self) -> int:
+        return sum(len(amounts) for amounts in self._amounts.values())
+
+    def _range(self, payer: str, lo: int, hi: int) -> list[PyrusEntry]:
+        return [self._source[row] for row in self._rows[payer][lo:hi]]
+
+    def exact(self, order: PaymentOrder) -> list[PyrusEntry]:
+        amounts = self._amounts.get(order.payer)
+        if not amounts:
+            return []
+        lo = bisect_left(amounts, order.amount)
+        hi = bisect_right(amounts, order.amount)
+        return [
+            e
+            for e in self._range(order.payer, lo, hi)
+            if (e.contragent_bin or e.contragent_bin2) == order.iin
+        ]
+
+    def candidates(
+        self,
+        order: PaymentOrder,
+        amount_tolerance: float = AMOUNT_TOLERANCE,
+        relative_amount_tolerance: float = RELATIVE_AMOUNT_TOLERANCE,
+        days_tolerance: int | None = DAYS_TOLERANCE,
+        same_iin: bool = True,
+    ) -> list[Candidate]:
+        amounts = self._amounts.get(order.payer)
+        if not amounts:
+            return []
+
+        tolerance = max(
+            amount_tolerance, abs(order.amount) * relative_amount_tolerance
+        )
+        lo = bisect_left(amounts, order.amount - tolerance)
+        hi = bisect_right(amounts, order.amount + tolerance)
+
+        candidates: list[Candidate] = []
+        for entry in self._range(order.payer, lo, hi):
+            contragent_bin = entry.contragent_bin or entry.contragent_bin2
+            if same_iin and contragent_bin != order.iin:
+                continue
+
+            days_delta = None
+            if entry.desired_date:
+                delta = entry.desired_date - order.value_date
+                days_delta = abs(delta.total_seconds()) / 86400
+            if days_tolerance is not None and (
+                days_delta is None or days_delta > days_tolerance
+            ):
+                continue
+
+            amount_delta = abs((entry.amount or 0.0) - order.amount)
+            candidates.append(Candidate(entry, amount_delta, days_delta))
+
+        candidates.sort(
+            key=lambda c: (
+                c.amount_delta,
+                c.days_delta if c.days_delta is not None else float("inf"),
+            )
+        )
+        return candidates
+
+
+def candidates_message(task_ids: list[int]) -> str:
+    candidates = ", ".join(
+        [f"https://pyrus.com/t#id{task_id}" for task_id in task_ids]
+    )
+    return (
+        "Невозможно определить задачу для вложения платежного поручения. "
+        f"Возможные кандидаты: {candidates}"
+    )
+
+
+def find_entry(
+    entries: Sequence[PyrusEntry],
+    order: PaymentOrder,
+    index: EntryRangeIndex | None = None,
+    tolerance: MatchTolerance | None = None,
+) -> Match:
+    found_entries: list[PyrusEntry] = []
+    if index:
+        found_entries = index.exact(order)
+    else:
+        for entry in entries:
+            if entry.payer != order.payer:
+                continue
+            contragent_bin = entry.contragent_bin or entry.contragent_bin2
+            found = contragent_bin == order.iin and entry.amount == order.amount
+            if found:
+                found_entries.append(entry)
+
+    message = None
+    if len(found_entries) > 1:
+        logger.info("Attempting to narrow down the search...")
+        message = candidates_message([e.task_id for e in found_entries])
+        if index:
+            task_ids = index.automaton.tasks(order.payment_purpose)
+            found_entries = [e for e in found_entries if e.task_id in task_ids]
+        else:
+            found_entries = [
+                e
+                for e in found_entries
+                if e.account_id and e.account_id in order.payment_purpose
+            ]
+
+    logger.info(f"Found count: {len(found_entries)}")
+    if not found_entries and not message and index and tolerance:
+        return find_near_entry(index, order, tolerance)
+    if not found_entries:
+        return None, message
+
+    found_entry = found_entries[0]
+    return found_entry, None
+
+
+def find_near_entry(
+    index: EntryRangeIndex,
+    order: PaymentOrder,
+    tolerance: MatchTolerance | None = None,
+) -> Match:
+    tolerance = tolerance or MatchTolerance()
+    candidates = index.candidates(
+        order,
+        amount_tolerance=tolerance.amount,
+        relative_amount_tolerance=tolerance.relative_amount,
+        days_tolerance=tolerance.days,
+    )
+    logger.info(f"Near-miss candidates count: {len(candidates)}")
+    if not candidates:
+        return None, None
+
+    if len(candidates) > 1:
+        task_ids = index.automaton.tasks(order.payment_purpose)
+        candidates = [
+            c for c in candidates if c.entry.task_id in task_ids
+        ] or candidates
+
+    best = candidates[0]
+    if len(candidates) == 1:
+        # The message of a found entry is kept as a note in the robot log
+        note = f"Найдено с допуском: разница суммы {best.amount_delta:.2f}"
+        if best.days_delta is not None:
+            note += f", разница дат {best.days_delta:.1f} дн."
+        logger.info(f"Task {best.entry.task_id}: {note}")
+        return best.entry, note
+
+    return None, candidates_message([c.entry.task_id for c in candidates])
+
+
+def entries_frame(entries: Sequence[PyrusEntry]) -> pd.DataFrame:
+    import numpy as np
+    import pandas as pd
+
+    return pd.DataFrame(
+        {
+            "entry_idx": np.arange(len(entries), dtype=np.int64),
+            "task_id": np.array([e.task_id for e in entries], dtype=np.int64),
+            "payer": [e.payer for e in entries],
+            "iin": [e.contragent_bin or e.contragent_bin2 for e in entries],
+            "amount": np.array(
+                [np.nan if e.amount is None else e.amount for e in entries],
+                dtype=np.float64,
+            ),
+            "account_id": [e.account_id or "" for e in entries],
+        }
+    )
+
+
+def orders_frame(orders: list[PaymentOrder]) -> pd.DataFrame:
+    import numpy as np
+    import pandas as pd
+
+    return pd.DataFrame(
+        {
+            "order_idx": np.arange(len(orders), dtype=np.int64),
+            "payer": [o.payer for o in orders],
+            "iin": [o.iin for o in orders],
+            "amount": np.array([o.amount for o in orders], dtype=np.float64),
+            "payment_purpose": [o.payment_purpose or "" for o in orders],
+        }
+    )
+
+
+def find_entries(
+    entries: Sequence[PyrusEntry], orders: list[PaymentOrder]
+) -> list[Match]:
+    # Kept out of module scope so the robot starts without pandas
+    import numpy as np
+
+    matches: list[Match] = [(None, None)] * len(orders)
+    if not entries or not orders:
+        return matches
+
+    entries_df = entries_frame(entries).dropna(subset=["iin", "amount"])
+    orders_df = orders_frame(orders)
+
+    joined = orders_df.merge(
+        entries_df, on=["payer", "iin", "amount"], how="inner", sort=False
+    ).sort_values(["order_idx", "entry_idx"], kind="stable")
+
+    ambiguous = (
+        joined.groupby("order_idx")["entry_idx"].transform("size").to_numpy()
+        > 1
+    )
+    automaton = AccountIdAutomaton(entries)
+    found_account_ids = [automaton.search(o.payment_purpose) for o in orders]
+    in_purpose = np.fromiter(
+        (
+            account_id in found_account_ids[order_idx]
+            for order_idx, account_id in zip(
+                joined["order_idx"].tolist(), joined["account_id"].tolist()
+            )
+        ),
+        dtype=bool,
+        count=len(joined),
+    )
+
+    chosen = joined.loc[~ambiguous | in_purpose].drop_duplicates(
+        "order_idx", keep="first"
+    )
+    for order_idx, entry_idx in zip(
+        chosen["order_idx"].tolist(), chosen["entry_idx"].tolist()
+    ):
+        matches[order_idx] = (entries[entry_idx], None)
+
+    unresolved = joined.loc[
+        ambiguous & ~joined["order_idx"].isin(chosen["order_idx"]).to_numpy()
+    ]
+    for order_idx, task_ids in (
+        unresolved.groupby("order_idx", sort=False)["task_id"].agg(list).items()
+    ):
+        matches[order_idx] = (None, candidates_message(task_ids))
+
+    logger.info(
+        f"Matched {len(chosen)} of {len(orders)} orders against {len(entries)} entries"
+    )
+    return matches
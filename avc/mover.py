@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import json
+import queue
+import threading
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, TypedDict
+
+import requests
+
+from avc.logger import get_logger
+from avc.storage import LocalStorage
+from avc.utils import MOVED_COLUMN, NOTE_COLUMN, PATH_COLUMN, Result
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from types import TracebackType
+    from typing import Any, Self
+
+    from avc.storage import Storage
+    from avc.utils import LogWriter
+
+logger = get_logger("avc")
+
+
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 60.0
+
+
+class MoveJobT(TypedDict):
+    id: str
+    src: str
+    dst: str
+    attempts: int
+    record: list[Any]
+    key: str | None
+
+
+class FileMover:
+    def __init__(
+        self,
+        journal_path: Path,
+        log_writer: LogWriter,
+        storage: Storage | None = None,
+        max_attempts: int = MAX_ATTEMPTS,
+        backoff: float = BACKOFF_SECONDS,
+        on_moved: Callable[[str, Path], None] | None = None,
+    ) -> None:
+        self.journal_path: Path = journal_path
+        self.log_writer: LogWriter = log_writer
+        self.storage: Storage = storage or LocalStorage()
+        self.max_attempts: int = max_attempts
+        self.backoff: float = backoff
+        self.on_moved: Callable[[str, Path], None] | None = on_moved
+
+        self.failed: list[tuple[Path, Result]] = []
+        self.moved: int = 0
+
+        self._jobs: dict[str, MoveJobT] = {}
+        self._queue: queue.Queue[str | None] = queue.Queue()
+        self._lock: threading.Lock = threading.Lock()
+        self._stop: threading.Event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self.load()
+
+    def load(self) -> None:
+        if not self.journal_path.exists():
+            return
+        try:
+            with self.journal_path.open("r", encoding="utf-8") as f:
+                jobs: list[MoveJobT] = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load move journal: {e}")
+            return
+
+        for job in jobs:
+            self._jobs[job["id"]] = job
+            self._queue.put(job["id"])
+        if jobs:
+            logger.info(f"Resuming {len(jobs)} pending moves from journal")
+
+    def save(self) -> None:
+        with self._lock:
+            jobs = list(self._jobs.values())
+            self.journal_path.parent.mkdir(exist_ok=True, parents=True)
+            tmp_path = self.journal_path.with_suffix(".tmp")
+            with tmp_path.open("w", encoding="utf-8") as f:
+                json.dump(jobs, f, ensure_ascii=False, indent=2, default=str)
+            tmp_path.replace(self.journal_path)
+
+    def start(self) -> None:
+        if self._thread:
+            return
+        self._thread = threading.Thread(
+            target=self._worker, name="mover", daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self,
+        src: Path,
+        dst: Path,
+        record: list[Any],
+        key: str | None = None,
+    ) -> None:
+        job: MoveJobT = {
+            "id": uuid.uuid4().hex,
+            "src": str(src),
+            "dst": str(dst),
+            "attempts": 0,
+            "record": record,
+            "key": key,
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+        self.save()
+        self._queue.put(job["id"])
+        logger.info(f"Queued move: {src.name!r} -> {dst.parent.as_posix()!r}")
+
+    def join(self) -> None:
+        self._queue.join()
+
+    def close(self) -> None:
+        if not self._thread:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _worker(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            try:
+                if job_id is None:
+                    return
+                self._process(self._jobs[job_id])
+            except Exception:
+                logger.exception("Move job failed")
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job: MoveJobT) -> None:
+        src, dst = Path(job["src"]), Path(job["dst"])
+        record = list(job["record"])
+        error: Exception | None = None
+
+        while True:
+            if self._stop.is_set():
+                # Keep the job in the journal for the next run
+                return
+            job["attempts"] += 1
+            try:
+                if not self.storage.exists(src) and self.storage.exists(dst):
+                    logger.info(f"Already moved: {dst.as_posix()!r}")
+                else:
+                    self.storage.move(src, dst)
+                error = None
+                break
+            except FileNotFoundError as e:
+                error = e
+                break
+            except (OSError, requests.RequestException) as e:
+                error = e
+                if job["attempts"] >= self.max_attempts:
+                    break
+                delay = min(
+                    self.backoff * 2 ** (job["attempts"] - 1),
+                    MAX_BACKOFF_SECONDS,
+                )
+                logger.warning(
+                    f"Move attempt {job['attempts']} of {src.name!r} failed: {e}, retrying in {delay:.0f}s"
+                )
+                self._stop.wait(delay)
+
+        if error is None:
+            logger.info(f"File moved: {dst.as_posix()!r}")
+            record[PATH_COLUMN] = str(dst)
+            record[MOVED_COLUMN] = "Да"
+            self.moved += 1
+            key = job.get("key")
+            if self.on_moved and key:
+                self.on_moved(key, dst)
+        else:
+            note = f"Не удалось перенести файл в {dst.parent.as_posix()!r}: {error}"
+            logger.error(note)
+            record[PATH_COLUMN] = str(src)
+            record[MOVED_COLUMN] = "Нет"
+            record[NOTE_COLUMN] = note
+            self.failed.append(
+                (src, Result(ok=False, message=note, outcome="move_failed"))
+            )
+
+        self.log_writer.write_record(record)
+        with self._lock:
+            del self._jobs[job["id"]]
+        self.save()
+
+    def __enter__(self) -> Self:
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        _: type[BaseException] | None,
+        exc: BaseException | None,
+        ___: TracebackType | None,
+    ) -> bool:
+        if exc is not None:
+            self._stop.set()
+        else:
+            self.join()
+        self.close()
+        logger.info(
+            f"Mover finished: {self.moved} moved, {len(self.failed)} failed, {len(self._jobs)} pending"
+        )
+        return False
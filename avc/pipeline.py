@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import heapq
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from avc.logger import get_logger
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+logger = get_logger("avc")
+
+
+QUEUE_SIZE = 4
+POLL_SECONDS = 0.5
+
+_DONE = object()
+_SKIP = object()
+
+
+@dataclass(slots=True)
+class Stage:
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    queue_size: int = QUEUE_SIZE
+    # Run on the thread that calls Pipeline.run, e.g. for the browser
+    # which has to stay on the thread that created it
+    inline: bool = False
+    # Handle items in the order the source produced them
+    ordered: bool = False
+    # Turns an item the stage failed on into the item passed downstream,
+    # so a failure still reaches the stages that record it
+    on_error: Callable[[Any, Exception], Any] | None = None
+
+    processed: int = 0
+    failed: int = 0
+    busy: float = 0.0
+    idle: float = 0.0
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    _inbox: queue.Queue[Any] = field(init=False)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock)
+    _live: int = field(init=False, default=0)
+    _next_seq: int = field(init=False, default=0)
+    _buffer: list[tuple[int, Any]] = field(init=False, default_factory=list)
+
+    def __post_init__(self) -> None:
+        self._inbox = queue.Queue(maxsize=self.queue_size)
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def report(self) -> str:
+        elapsed = self.elapsed
+        rate = self.processed / elapsed * 60 if elapsed else 0.0
+        return (
+            f"{self.name:<10} x{self.workers}: {self.processed} processed, "
+            f"{self.failed} failed, busy {self.busy:.1f}s, "
+            f"idle {self.idle:.1f}s, {rate:.1f}/min"
+        )
+
+
+class Pipeline:
+    def __init__(self, stages: list[Stage]) -> None:
+        if sum(stage.inline for stage in stages) > 1:
+            raise ValueError("Only one stage can run inline")
+        if any(stage.ordered and stage.workers > 1 for stage in stages):
+            raise ValueError("Ordered stages must have a single worker")
+        self.stages: list[Stage] = stages
+        self.discovery: Stage = Stage("discovery", func=lambda item: item)
+        self._stop: threading.Event = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def _put(self, q: queue.Queue[Any], item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _feed(self, source: Iterable[Any]) -> None:
+        discovery = self.discovery
+        first = self.stages[0]
+        items = iter(source)
+        discovery.started_at = time.perf_counter()
+        seq = 0
+        try:
+            while True:
+                started_at = time.perf_counter()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                finally:
+                    discovery.busy += time.perf_counter() - started_at
+                discovery.processed += 1
+
+                waited_at = time.perf_counter()
+                if not self._put(first._inbox, (seq, item)):
+                    return
+                discovery.idle += time.perf_counter() - waited_at
+                seq += 1
+        except Exception:
+            logger.exception("Pipeline source failed")
+            discovery.failed += 1
+        finally:
+            discovery.finished_at = time.perf_counter()
+            for _ in range(first.workers):
+                self._put(first._inbox, _DONE)
+
+    def _work(self, idx: int) -> None:
+        stage = self.stages[idx]
+        next_stage = (
+            self.stages[idx + 1] if idx + 1 < len(self.stages) else None
+        )
+
+        while not self._stop.is_set():
+            waited_at = time.perf_counter()
+            try:
+                item = stage._inbox.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                stage.idle += time.perf_counter() - waited_at
+                continue
+            stage.idle += time.perf_counter() - waited_at
+
+            if item is _DONE:
+                break
+
+            if not stage.ordered:
+                self._handle(stage, next_stage, *item)
+                continue
+
+            heapq.heappush(stage._buffer, item)
+            while stage._buffer and stage._buffer[0][0] == stage._next_seq:
+                self._handle(stage, next_stage, *heapq.heappop(stage._buffer))
+                stage._next_seq += 1
+
+        # Only reachable when a sequence number went missing
+        while stage._buffer and not self._stop.is_set():
+            self._handle(stage, next_stage, *heapq.heappop(stage._buffer))
+
+        with stage._lock:
+            stage._live -= 1
+            last = stage._live == 0
+            if last:
+                stage.finished_at = time.perf_counter()
+        if last and next_stage:
+            for _ in range(next_stage.workers):
+                self._put(next_stage._inbox, _DONE)
+
+    def _handle(
+        self, stage: Stage, next_stage: Stage | None, seq: int, item: Any
+    ) -> None:
+        result = _SKIP
+        if item is not _SKIP:
+            started_at = time.perf_counter()
+            with stage._lock:
+                if stage.started_at is None:
+                    stage.started_at = started_at
+            try:
+                result = stage.func(item)
+                with stage._lock:
+                    stage.processed += 1
+            except Exception as e:
+                logger.exception(f"Stage {stage.name!r} failed")
+                with stage._lock:
+                    stage.failed += 1
+                result = self._recover(stage, item, e)
+            finally:
+                with stage._lock:
+                    stage.busy += time.perf_counter() - started_at
+
+        # Dropped items still pass their sequence number downstream so
+        # ordered stages do not wait for them
+        if next_stage:
+            self._put(
+                next_stage._inbox, (seq, _SKIP if result is None else result)
+            )
+
+    def _recover(self, stage: Stage, item: Any, error: Exception) -> Any:
+        if not stage.on_error:
+            return _SKIP
+        try:
+            return stage.on_error(item, error)
+        except Exception:
+            logger.exception(f"Stage {stage.name!r} failed to recover")
+            return _SKIP
+
+    def run(self, source: Iterable[Any]) -> None:
+        inline_idx: int | None = None
+        for idx, stage in enumerate(self.stages):
+            stage._live = 1 if stage.inline else stage.workers
+            if stage.inline:
+                stage.workers = 1
+                inline_idx = idx
+                continue
+            for n in range(stage.workers):
+                self._spawn(f"{stage.name}-{n}", self._work, idx)
+        self._spawn("discovery", self._feed, source)
+
+        try:
+            if inline_idx is not None:
+                self._work(inline_idx)
+            for thread in self._threads:
+                while thread.is_alive():
+                    thread.join(timeout=POLL_SECONDS)
+        finally:
+            self._stop.set()
+            for thread in self._threads:
+                thread.join()
+            self._threads.clear()
+            self.log_report()
+
+    def _spawn(
+        self, name: str, target: Callable[..., None], *args: Any
+    ) -> None:
+        thread = threading.Thread(
+            target=target, args=args, name=name, daemon=True
+        )
+        thread.start()
+        self._threads.append(thread)
+
+    def log_report(self) -> None:
+        logger.info("Pipeline throughput:")
+        for stage in [self.discovery, *self.stages]:
+            logger.info(stage.report())
+        bottleneck = max(
+            self.stages, key=lambda stage: stage.busy / stage.workers
+        )
+        logger.info(f"Bottleneck stage: {bottleneck.name!r}")
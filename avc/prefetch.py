@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from avc.logger import get_logger
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Generator, Iterable
+    from concurrent.futures import Future
+
+logger = get_logger("avc")
+
+
+PREFETCH_DEPTH = 4
+PREFETCH_WORKERS = 2
+PREFETCH_MAX_BYTES = 256 * 1024 * 1024
+
+
+def prefetch[T, R](
+    items: Iterable[T],
+    fetch: Callable[[T], R],
+    depth: int = PREFETCH_DEPTH,
+    workers: int = PREFETCH_WORKERS,
+    max_bytes: int = PREFETCH_MAX_BYTES,
+    size: Callable[[T], int] = lambda _: 0,
+) -> Generator[R]:
+    source = iter(items)
+    in_flight: deque[tuple[int, Future[R]]] = deque()
+    in_flight_bytes = 0
+    exhausted = False
+
+    executor = ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="prefetch"
+    )
+    try:
+        while True:
+            while not exhausted and len(in_flight) < depth:
+                if in_flight and in_flight_bytes >= max_bytes:
+                    break
+                try:
+                    item = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                item_size = size(item)
+                in_flight_bytes += item_size
+                in_flight.append((item_size, executor.submit(fetch, item)))
+
+            if not in_flight:
+                return
+
+            item_size, future = in_flight.popleft()
+            try:
+                result = future.result()
+            finally:
+                in_flight_bytes -= item_size
+            yield result
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, TypedDict
+
+from avc.logger import get_logger
+from avc.scanner import find_first_dir
+from avc.storage import LocalStorage
+
+if TYPE_CHECKING:
+    from types import TracebackType
+    from typing import Self
+
+    from avc.storage import Storage
+
+logger = get_logger("avc")
+
+
+class DirNodeT(TypedDict):
+    mtime: float
+    children: list[str]
+
+
+class ProjectFoldersT(TypedDict):
+    supplier: str | None
+    finance: dict[str, str]
+
+
+class ProjectIndexT(TypedDict):
+    dirs: dict[str, DirNodeT]
+    projects: dict[str, ProjectFoldersT]
+
+
+SUPPLIER_MAX_DEPTH = 10
+
+
+def find_supplier_path(project_path: Path, storage: Storage) -> Path | None:
+    return find_first_dir(
+        project_path,
+        lambda name: "поставщик" in name.lower(),
+        max_depth=SUPPLIER_MAX_DEPTH,
+        listdir=storage.listdir,
+    )
+
+
+class ProjectIndex:
+    def __init__(
+        self,
+        cache_path: Path,
+        max_depth: int = 2,
+        storage: Storage | None = None,
+    ) -> None:
+        self.cache_path: Path = cache_path
+        self.max_depth: int = max_depth
+        self.storage: Storage = storage or LocalStorage()
+
+        self._data: ProjectIndexT = {"dirs": {}, "projects": {}}
+        self._refreshed: set[str] = set()
+        self._dirty: bool = False
+
+        self.load()
+
+    def load(self) -> None:
+        if not self.cache_path.exists():
+            return
+        try:
+            with self.cache_path.open("r", encoding="utf-8") as f:
+                self._data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load project index: {e}")
+            self._data = {"dirs": {}, "projects": {}}
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.cache_path.parent.mkdir(exist_ok=True, parents=True)
+        tmp_path = self.cache_path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False)
+        tmp_path.replace(self.cache_path)
+        self._dirty = False
+
+    def list_dirs(self, path: str) -> dict[str, float]:
+        try:
+            return {
+                entry.name: entry.mtime
+                for entry in self.storage.listdir(path)
+                if entry.is_dir
+            }
+        except (OSError, PermissionError):
+            return {}
+
+    def refresh(self, root: Path) -> None:
+        dirs = self._data["dirs"]
+        seen: set[str] = set()
+        listed = 0
+
+        def visit(path: str, mtime: float, depth: int) -> None:
+            nonlocal listed
+            if depth > self.max_depth:
+                return
+            seen.add(path)
+
+            # A listing carries the mtimes of the children, so every folder
+            # above the last level is listed and only the last level is
+            # taken from the cache while its mtime holds
+            node = dirs.get(path)
+            if node and node["mtime"] == mtime and depth == self.max_depth:
+                return
+
+            children = self.list_dirs(path)
+            listed += 1
+            if (
+                not node
+                or node["mtime"] != mtime
+                or node["children"] != list(children)
+            ):
+                dirs[path] = DirNodeT(mtime=mtime, children=list(children))
+                self._dirty = True
+
+            for name, child_mtime in children.items():
+                visit(os.path.join(path, name), child_mtime, depth + 1)
+
+        root_key = str(root)
+        try:
+            st = self.storage.stat(root_key)
+        except OSError:
+            st = None
+        if st:
+            visit(root_key, st.mtime, 0)
+
+        prefix = os.path.join(root_key, "")
+        for path in list(dirs):
+            if path in seen:
+                continue
+            if path == root_key or path.startswith(prefix):
+                del dirs[path]
+                self._dirty = True
+
+        self._refreshed.add(root_key)
+        logger.info(
+            f"Project index for {root.as_posix()!r} refreshed, {listed} of {len(seen)} folders listed"
+        )
+
+    def find_project(self, root: Path, project_id: str) -> Path | None:
+        root_key = str(root)
+        if root_key not in self._refreshed:
+            self.refresh(root)
+
+        dirs = self._data["dirs"]
+
+        def search(path: str, depth: int) -> str | None:
+            if depth > self.max_depth:
+                return None
+            node = dirs.get(path)
+            if not node:
+                return None
+            for name in node["children"]:
+                child = os.path.join(path, name)
+                if project_id in name:
+                    return child
+                result = search(child, depth + 1)
+                if result:
+                    return result
+            return None
+
+        project_path = search(root_key, 0)
+        return Path(project_path) if project_path else None
+
+    def _project(self, project_path: Path) -> ProjectFoldersT:
+        projects = self._data["projects"]
+        key = str(project_path)
+        if key not in projects:
+            projects[key] = {"supplier": None, "finance": {}}
+        return projects[key]
+
+    def find_supplier(self, project_path: Path) -> Path | None:
+        project = self._project(project_path)
+        supplier = project["supplier"]
+        if supplier and self.storage.exists(supplier):
+            return Path(supplier)
+
+        supplier_path = find_supplier_path(project_path, self.storage)
+        project["supplier"] = str(supplier_path) if supplier_path else None
+        project["finance"] = {}
+        self._dirty = True
+        return supplier_path
+
+    def find_finance(self, project_path: Path, iin: str) -> Path | None:
+        finance = self._project(project_path)["finance"].get(iin)
+        if finance and self.storage.exists(finance):
+            return Path(finance)
+        return None
+
+    def remember_finance(
+        self, project_path: Path, iin: str, finance_path: Path
+    ) -> None:
+        self._project(project_path)["finance"][iin] = str(finance_path)
+        self._dirty = True
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        _: type[BaseException] | None,
+        __: BaseException | None,
+        ___: TracebackType | None,
+    ) -> bool:
+        try:
+            self.save()
+        except OSError:
+            logger.exception(f"Failed to save {self.cache_path}")
+        return False
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Protocol
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from avc.browser_pool import BrowserPool
+from avc.logger import get_logger
+from avc.pyrus_client import (
+    approve_task,
+    ensure_login,
+    save_task,
+    upload_payment_order,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Generator
+    from pathlib import Path
+    from types import TracebackType
+    from typing import Self
+
+    from avc.pyrus_client import Credentials
+    from avc.pyrus_selenium import PyrusWebClient
+
+logger = get_logger("avc")
+
+
+API_RATE = 5.0
+API_BURST = 5
+UPLOAD_WORKERS = 4
+
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate: float = rate
+        self.burst: int = burst
+
+        self._tokens: float = burst
+        self._updated_at: float = time.monotonic()
+        self._lock: threading.Lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated_at) * self.rate,
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+
+_limiters: dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def account_rate_limiter(
+    account: str, rate: float = API_RATE, burst: int = API_BURST
+) -> RateLimiter:
+    with _limiters_lock:
+        if account not in _limiters:
+            _limiters[account] = RateLimiter(rate, burst)
+        return _limiters[account]
+
+
+class UploadClient(Protocol):
+    def login(self) -> None: ...
+
+    def upload_file(self, task_id: int, file_path: Path) -> str | None: ...
+
+    def __enter__(self) -> Self: ...
+
+    def __exit__(
+        self,
+        _: type[BaseException] | None,
+        __: BaseException | None,
+        ___: TracebackType | None,
+    ) -> bool: ...
+
+
+class PyrusApiClient:
+    def __init__(
+        self,
+        creds: Credentials,
+        fallback: UploadClient | None = None,
+        pool_size: int = UPLOAD_WORKERS,
+        rate: float = API_RATE,
+        session: requests.Session | None = None,
+    ) -> None:
+        self.creds: Credentials = creds
+        self.fallback: UploadClient | None = fallback
+        self.limiter: RateLimiter = account_rate_limiter(creds.email, rate)
+
+        self.session: requests.Session = session or requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size
+        )
+        self.session.mount("https://", adapter)
+
+        self._fallback_logged_in: bool = False
+        self._browser_lock: threading.Lock = threading.Lock()
+        self._task_locks: dict[int, threading.Lock] = {}
+        self._task_locks_lock: threading.Lock = threading.Lock()
+
+    def login(self) -> None:
+        self.limiter.acquire()
+        ensure_login(self.session, self.creds)
+
+    @contextmanager
+    def task_lock(self, task_id: int) -> Generator[None]:
+        with self._task_locks_lock:
+            lock = self._task_locks.setdefault(task_id, threading.Lock())
+        with lock:
+            yield
+
+    def upload_with_browser(self, task_id: int, file_path: Path) -> str | None:
+        assert self.fallback, "fallback is None"
+        with self._browser_lock:
+            if not self._fallback_logged_in:
+                # Not retried, a browser that failed to start fails uploads
+                self._fallback_logged_in = True
+                self.fallback.login()
+        return self.fallback.upload_file(task_id=task_id, file_path=file_path)
+
+    def upload_file(self, task_id: int, file_path: Path) -> str | None:
+        with self.task_lock(task_id):
+            return self._upload_file(task_id, file_path)
+
+    def _upload_file(self, task_id: int, file_path: Path) -> str | None:
+        started_at = time.perf_counter()
+        saved = False
+        try:
+            self.limiter.acquire()
+            guid = upload_payment_order(self.session, file_path)
+            if not guid:
+                raise requests.HTTPError("Upload response has no file guid")
+            self.limiter.acquire()
+            # Without the follow-up GetTask, a failure after this point
+            # cannot hide an attachment that already happened
+            save_task(
+                self.session, task_id, guid, file_path.name, refresh=False
+            )
+            saved = True
+            logger.info(f"Task {task_id} saved")
+            self.limiter.acquire()
+            approve_task(self.session, task_id, refresh=False)
+        except requests.RequestException as e:
+            logger.error(f"API upload to task {task_id} failed: {e}")
+            if saved:
+                # The file is already attached, the browser would attach it
+                # a second time
+                return (
+                    "Загрузка файла: файл прикреплен, но задачу не удалось "
+                    "утвердить\n"
+                )
+            if not self.fallback:
+                return f"Загрузка файла: {e}\n"
+            logger.info(f"Falling back to browser for task {task_id}")
+            return self.upload_with_browser(task_id, file_path)
+
+        logger.info(
+            f"Task {task_id} approved via API in {time.perf_counter() - started_at:.2f}s"
+        )
+        return None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        _: type[BaseException] | None,
+        __: BaseException | None,
+        ___: TracebackType | None,
+    ) -> bool:
+        self.session.close()
+        if self.fallback:
+            self.fallback.__exit__(_, __, ___)
+        return False
+
+
+def get_upload_client(
+    creds: Credentials,
+    web_client: PyrusWebClient | BrowserPool,
+    session: requests.Session | None = None,
+) -> UploadClient:
+    backend = os.environ.get("UPLOAD_BACKEND", "browser")
+    logger.info(f"Using upload backend: {backend!r}")
+    if backend == "api":
+        # Fallbacks come from the upload workers, a browser has to stay on
+        # the thread that created it
+        fallback = (
+            web_client
+            if isinstance(web_client, BrowserPool)
+            else BrowserPool(lambda _: web_client, size=1)
+        )
+        return PyrusApiClient(
+            creds,
+            fallback=fallback,
+            rate=float(os.environ.get("PYRUS_API_RATE", API_RATE)),
+            session=session,
+        )
+    return web_client
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import json
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import TYPE_CHECKING, NamedTuple, cast
 
@@ -15,6 +17,7 @@ from avc.models import (
 )
 
 if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable
     from pathlib import Path
     from typing import Any
 
@@ -26,6 +29,7 @@ if TYPE_CHECKING:
         PyrusAmountFieldT,
         PyrusDateFieldT,
         PyrusEntryT,
+        PyrusFieldFilesT,
         PyrusItemsFieldT,
         PyrusStrValuesFieldT,
         PyrusTextFieldT,
@@ -43,17 +47,151 @@ class Credentials(NamedTuple):
     person_id: int
 
 
-def get_active_entries(creds: Credentials) -> list[PyrusEntry]:
-    with requests.Session() as session:
-        pyrus_login(session, creds)
-        logger.info("Pyrus login successful")
+FETCH_WINDOW_DAYS = 7
+COOKIE_DOMAIN = "pyrus.com"
+REGISTER_LIMIT = 1000
+ATTACHMENT_FIELD_ID = 113
+REQUEST_TIMEOUT = 60.0
+ERROR_KEYS = ("Error", "ErrorCode", "ErrorText", "ErrorMessage")
 
+
+def has_session_cookies(session: requests.Session) -> bool:
+    return any(
+        cookie.domain.endswith(COOKIE_DOMAIN) for cookie in session.cookies
+    )
+
+
+def ensure_login(session: requests.Session, creds: Credentials) -> None:
+    if has_session_cookies(session):
+        logger.info("Reusing Pyrus session")
+        return
+    pyrus_login(session, creds)
+    logger.info("Pyrus login successful")
+
+
+@contextmanager
+def pyrus_session(
+    creds: Credentials, session: requests.Session | None = None
+) -> Generator[requests.Session]:
+    # A shared session is left open for the browser and the uploads
+    if session is not None:
+        ensure_login(session, creds)
+        yield session
+        return
+    with requests.Session() as own_session:
+        ensure_login(own_session, creds)
+        yield own_session
+
+
+def get_active_entries(
+    creds: Credentials,
+    session: requests.Session | None = None,
+    task_states: TaskStateIndex | None = None,
+) -> list[PyrusEntry]:
+    with pyrus_session(creds, session) as http:
         builder = PayloadBuilder()
         payload = (
             builder.stage("5").active_only(True).max_item_count(1000).resolve()
         )
-        data = get_entry_data(session, payload)
+        data = get_entry_data(http, payload)
+
+    if task_states is not None:
+        task_states.add_forms(data.get("Forms", []))
+    return parse_entries(data)
+
+
+def form_attachments(form: PyrusEntryT) -> set[tuple[str, int]]:
+    for field in form.get("Fields", []):
+        if field.get("FieldId") == ATTACHMENT_FIELD_ID:
+            field = cast("PyrusFieldFilesT", field)
+            return {
+                (file["Name"], file["Size"])
+                for file in field.get("ExistingFiles", [])
+            }
+    return set()
+
+
+class TaskStateIndex:
+    def __init__(self) -> None:
+        self._attachments: dict[int, set[tuple[str, int]]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def add_forms(self, forms: Iterable[PyrusEntryT]) -> None:
+        with self._lock:
+            for form in forms:
+                self._attachments[form["TaskId"]] = form_attachments(form)
+
+    def is_attached(self, task_id: int, file_path: Path) -> bool:
+        with self._lock:
+            files = self._attachments.get(task_id, set())
+        return (file_path.name, file_path.stat().st_size) in files
+
+
+def get_order_entries(
+    creds: Credentials,
+    orders: list[PaymentOrder],
+    session: requests.Session | None = None,
+    task_states: TaskStateIndex | None = None,
+) -> list[PyrusEntry]:
+    windows: dict[str, tuple[datetime, datetime]] = {}
+    for order in orders:
+        from_dt, to_dt = windows.get(
+            order.payer, (order.value_date, order.value_date)
+        )
+        windows[order.payer] = (
+            min(from_dt, order.value_date),
+            max(to_dt, order.value_date),
+        )
+
+    if not windows:
+        return []
+    data: DataT = {"ScopeCache": {"Persons": []}, "Forms": []}
+
+    # The window filters on field 116 (desired payment date), which exact
+    # matching ignores. Entries without a desired date, or with one more
+    # than FETCH_WINDOW_DAYS away from every order of the payer, are not
+    # fetched here although FETCH_MODE=full would match them
+    margin = timedelta(days=FETCH_WINDOW_DAYS)
+    task_ids: set[int] = set()
+    person_ids: set[int] = set()
+    with pyrus_session(creds, session) as http:
+        for payer, (from_dt, to_dt) in windows.items():
+            builder = PayloadBuilder()
+            payload = (
+                builder.stage("5")
+                .active_only(True)
+                .max_item_count(REGISTER_LIMIT)
+                .payer_id(payer)
+                .dt_range(from_dt - margin, to_dt + margin)
+                .resolve()
+            )
+            logger.debug(f"{builder!r}")
+            payer_data = get_entry_data(http, payload)
+
+            forms = payer_data.get("Forms", [])
+            logger.info(f"Found {len(forms)} entries for payer {payer!r}")
+            if len(forms) >= REGISTER_LIMIT:
+                logger.warning(
+                    f"Register for payer {payer!r} is truncated at {REGISTER_LIMIT} entries, some orders may not match"
+                )
+            for form in forms:
+                if form["TaskId"] in task_ids:
+                    continue
+                task_ids.add(form["TaskId"])
+                data["Forms"].append(form)
 
+            for person in payer_data["ScopeCache"]["Persons"]:
+                if person["Id"] in person_ids:
+                    continue
+                person_ids.add(person["Id"])
+                data["ScopeCache"]["Persons"].append(person)
+
+    if task_states is not None:
+        task_states.add_forms(data["Forms"])
+    return parse_entries(data)
+
+
+def parse_entries(data: DataT) -> list[PyrusEntry]:
     persons = data["ScopeCache"]["Persons"]
     logger.info(f"Found {len(persons)} persons")
 
@@ -201,7 +339,9 @@ def pyrus_login(session: requests.Session, creds: Credentials) -> None:
     logger.debug(f"Pyrus login with data: {json_data!r}")
 
     response = session.post(
-        "https://accounts.pyrus.com/auth/check-pwd", json=json_data
+        "https://accounts.pyrus.com/auth/check-pwd",
+        json=json_data,
+        timeout=REQUEST_TIMEOUT,
     )
     logger.debug(f"Pyrus login response: {response.status_code!r}")
     response.raise_for_status()
@@ -221,6 +361,7 @@ def get_contract_id(
     response = session.post(
         "https://pyrus.com/Services/ClientServiceV2.svc/GetCatalogs",
         json=json_data,
+        timeout=REQUEST_TIMEOUT,
     )
     logger.debug(f"Get contract catalogue response: {response.status_code!r}")
 
@@ -253,6 +394,7 @@ def get_entry_data(session: requests.Session, payload: PyrusPayload) -> DataT:
     response = session.post(
         "https://pyrus.com/Services/ClientServiceV2.svc/GetForms",
         json=payload_json,
+        timeout=REQUEST_TIMEOUT,
     )
     logger.debug(f"Get entry list response: {response.status_code!r}")
 
@@ -328,6 +470,26 @@ def find_entry(
     return None if not entries else entries[0]
 
 
+def check_response(response: requests.Response) -> dict[str, Any]:
+    # The service answers 200 with an error body for rejected actions
+    response.raise_for_status()
+    try:
+        data = json.loads(response.content.decode("utf-8-sig"))
+    except ValueError as e:
+        raise requests.HTTPError(
+            f"Invalid response body: {e}", response=response
+        ) from e
+    result = data.get("d") if isinstance(data, dict) else None
+    if not isinstance(result, dict):
+        raise requests.HTTPError(
+            f"Unexpected response body: {str(data)[:200]!r}", response=response
+        )
+    error = next((result[key] for key in ERROR_KEYS if result.get(key)), None)
+    if error:
+        raise requests.HTTPError(f"Pyrus error: {error!r}", response=response)
+    return result
+
+
 def upload_payment_order(session: requests.Session, file_path: Path) -> str:
     params = {
         "asdefault": "false",
@@ -340,6 +502,7 @@ def upload_payment_order(session: requests.Session, file_path: Path) -> str:
             "https://files.pyrus.com/services/upload/0.0/upload",
             params=params,
             files=files,
+            timeout=REQUEST_TIMEOUT,
         )
         response.raise_for_status()
         data = response.json()
@@ -352,7 +515,11 @@ compact_form_cache_sign: str = "EDvxSgAAAADWThQAUpcWAA=="
 
 
 def save_task(
-    session: requests.Session, task_id: int, guid: str, file_name: str
+    session: requests.Session,
+    task_id: int,
+    guid: str,
+    file_name: str,
+    refresh: bool = True,
 ) -> None:
     json_data = {
         "req": {
@@ -363,7 +530,7 @@ def save_task(
                     "Fields": [
                         {
                             "__type": "FormFieldFiles:http://schemas.datacontract.org/2004/07/Papirus.BackEnd.Forms",
-                            "FieldId": 113,
+                            "FieldId": ATTACHMENT_FIELD_ID,
                             "NewFiles": [
                                 {
                                     "Type": 0,
@@ -414,12 +581,16 @@ def save_task(
     response = session.post(
         "https://pyrus.com/Services/ClientServiceV2.svc/AddTaskComment",
         json=json_data,
+        timeout=REQUEST_TIMEOUT,
     )
-    response.raise_for_status()
+    check_response(response)
     # content = response.content.decode("utf-8-sig")
     # data = json.loads(content)
     # print(json.dumps(data, ensure_ascii=False, indent=2))
 
+    if not refresh:
+        return
+
     json_data = {
         "req": {
             "TaskId": task_id,
@@ -441,11 +612,14 @@ def save_task(
     response = session.post(
         "https://pyrus.com/Services/ClientServiceV2.svc/GetTask",
         json=json_data,
+        timeout=REQUEST_TIMEOUT,
     )
     response.raise_for_status()
 
 
-def approve_task(session: requests.Session, task_id: int) -> None:
+def approve_task(
+    session: requests.Session, task_id: int, refresh: bool = True
+) -> None:
     json_data = {
         "req": {
             "Params": {
@@ -495,13 +669,17 @@ def approve_task(session: requests.Session, task_id: int) -> None:
     response = session.post(
         "https://pyrus.com/Services/ClientServiceV2.svc/AddTaskComment",
         json=json_data,
+        timeout=REQUEST_TIMEOUT,
     )
-    response.raise_for_status()
+    check_response(response)
 
     # content = response.content.decode("utf-8-sig")
     # data = json.loads(content)
     # print(json.dumps(data, ensure_ascii=False, indent=2))
 
+    if not refresh:
+        return
+
     json_data = {
         "req": {
             "TaskId": task_id,
@@ -523,5 +701,6 @@ def approve_task(session: requests.Session, task_id: int) -> None:
     response = session.post(
         "https://pyrus.com/Services/ClientServiceV2.svc/GetTask",
         json=json_data,
+        timeout=REQUEST_TIMEOUT,
     )
     response.raise_for_status()
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
 import os
+import threading
+import time
+from contextlib import contextmanager
 from time import sleep
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, TypeVar
 
 from pywinauto import Application, mouse
+from pywinauto.findwindows import ElementNotFoundError
 from selenium.common.exceptions import (
     StaleElementReferenceException,
+    TimeoutException,
     WebDriverException,
 )
 from selenium.webdriver import ActionChains, Chrome, ChromeOptions, Keys
@@ -16,19 +21,101 @@ from selenium.webdriver.support import expected_conditions as ec
 from selenium.webdriver.support.ui import WebDriverWait
 
 from avc.logger import get_logger
+from avc.pyrus_client import COOKIE_DOMAIN
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Generator
     from pathlib import Path
     from types import TracebackType
-    from typing import Self
+    from typing import Any, Self
 
+    import requests
     from pywinauto import WindowSpecification
+    from pywinauto.controls.uiawrapper import UIAWrapper
     from selenium.webdriver.chrome.webdriver import WebDriver
+    from selenium.webdriver.remote.webelement import WebElement
 
 logger = get_logger("avc")
 
 
-def get_center(element: WindowSpecification) -> tuple[int, int]:
+T = TypeVar("T")
+
+
+# Mouse and window focus are shared by every browser on the desktop
+UI_LOCK = threading.RLock()
+
+ATTACHMENT_FIELD = "5. Вложение платежного поручения"
+
+BROWSER_MODES = ("full", "lean", "headless")
+BLOCKED_URLS = [
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*mc.yandex.ru*",
+    "*doubleclick.net*",
+]
+LEAN_ARGUMENTS = [
+    "--disable-extensions",
+    "--disable-component-update",
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    "--no-first-run",
+]
+
+SIDEBAR_BUTTON = "Развернуть сайдбар задачи"
+# The decision panel of the task, holds the approve button and the status
+SIDEBAR_SELECTOR = ".sideBySideRightContent .sideBySideSubheader"
+SIDEBAR_ID = "avc-task-sidebar"
+
+PROBE_URL = "https://pyrus.com/"
+APP_SHELL = "#layout"
+COOKIE_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly")
+
+NAVIGATION_TIMEOUT = 30
+FORM_TIMEOUT = 20
+UPLOAD_TIMEOUT = 60
+UI_TIMEOUT = 30
+IDLE_TIMEOUT = 10
+NETWORK_QUIET = 0.5
+POLL_INITIAL = 0.1
+POLL_MAX = 1.0
+
+# Counts fetch/XHR requests still in flight. Task pages only change the hash,
+# so the document and the counter survive navigation between tasks
+NETWORK_HOOK = """
+if (!window.__avcNetwork) {
+    const state = { pending: 0 };
+    window.__avcNetwork = state;
+    performance.setResourceTimingBufferSize(100000);
+    const done = () => {
+        state.pending = Math.max(0, state.pending - 1);
+    };
+    const fetch = window.fetch;
+    window.fetch = function (...args) {
+        state.pending += 1;
+        return fetch.apply(this, args).finally(done);
+    };
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function (...args) {
+        state.pending += 1;
+        this.addEventListener("loadend", done, { once: true });
+        return send.apply(this, args);
+    };
+}
+"""
+
+
+def get_center(element: UIAWrapper) -> tuple[int, int]:
     rect = element.rectangle()
     center = rect.mid_point()
     return center.x, center.y
@@ -36,16 +123,35 @@ def get_center(element: WindowSpecification) -> tuple[int, int]:
 
 class PyrusWebClient:
     def __init__(
-        self, driver_path: Path | str, chrome_path: Path | str
+        self,
+        driver_path: Path | str,
+        chrome_path: Path | str,
+        profile_dir: Path | None = None,
+        ui_lock: threading.RLock = UI_LOCK,
+        mode: str = "full",
+        session: requests.Session | None = None,
     ) -> None:
+        if mode not in BROWSER_MODES:
+            raise ValueError(f"Unknown browser mode: {mode!r}")
         self.driver_path: str = str(driver_path)
         self.chrome_path: str = str(chrome_path)
+        self.mode: str = mode
+        # Headless Chrome has no window for pywinauto to drive
+        self.uses_desktop: bool = mode != "headless"
+        self.profile_dir: Path | None = profile_dir
+        self.ui_lock: threading.RLock = ui_lock
+        # Shared with the HTTP client, whichever logs in first seeds the other
+        self.session: requests.Session | None = session
 
         self._driver: WebDriver | None = None
         self._wait: WebDriverWait[WebDriver] | None = None
         self._actions: ActionChains | None = None
         self._app: Application | None = None
         self._win: WindowSpecification | None = None
+        self._elements: dict[str, UIAWrapper] = {}
+
+        self.timings: dict[str, list[float]] = {}
+        self._step_times: dict[str, float] = {}
 
     @property
     def driver(self) -> WebDriver:
@@ -56,14 +162,62 @@ class PyrusWebClient:
         options = ChromeOptions()
         options.binary_location = self.chrome_path
         prefs = {"profile.default_content_setting_values.notifications": 2}
+        if self.mode != "full":
+            prefs["profile.managed_default_content_settings.images"] = 2
         options.add_experimental_option("prefs", prefs)
-        options.add_argument("--start-maximized")
         options.add_experimental_option("excludeSwitches", ["enable-logging"])
         options.add_argument("--log-level=3")
-        options.add_argument("--force-renderer-accessibility")
+        if self.uses_desktop:
+            options.add_argument("--start-maximized")
+            options.add_argument("--force-renderer-accessibility")
+        else:
+            options.add_argument("--headless=new")
+            options.add_argument("--window-size=1920,1080")
+        if self.mode != "full":
+            for argument in LEAN_ARGUMENTS:
+                options.add_argument(argument)
+        if self.profile_dir:
+            self.profile_dir.mkdir(exist_ok=True, parents=True)
+            # The profile keeps the cookies, drop the plaintext copy that
+            # earlier versions saved next to it
+            (self.profile_dir / "pyrus_cookies.json").unlink(missing_ok=True)
+            options.add_argument(f"--user-data-dir={self.profile_dir}")
         self._driver = Chrome(service=service, options=options)
+
+        try:
+            self._driver.execute_cdp_cmd(
+                "Page.addScriptToEvaluateOnNewDocument",
+                {"source": NETWORK_HOOK},
+            )
+        except WebDriverException as e:
+            logger.warning(f"Failed to install network hook: {e}")
+        if self.mode != "full":
+            try:
+                self._driver.execute_cdp_cmd("Network.enable", {})
+                self._driver.execute_cdp_cmd(
+                    "Network.setBlockedURLs", {"urls": BLOCKED_URLS}
+                )
+            except WebDriverException as e:
+                logger.warning(f"Failed to block resources: {e}")
+        logger.info(f"Chrome started in {self.mode!r} mode")
         return self._driver
 
+    @property
+    def browser_pid(self) -> int | None:
+        try:
+            info = self.driver.execute_cdp_cmd("SystemInfo.getProcessInfo", {})
+        except WebDriverException as e:
+            logger.debug(f"Failed to get browser process: {e}")
+            return None
+        return next(
+            (
+                process["id"]
+                for process in info.get("processInfo", [])
+                if process.get("type") == "browser"
+            ),
+            None,
+        )
+
     @property
     def wait(self) -> WebDriverWait[WebDriver]:
         if self._wait:
@@ -82,7 +236,15 @@ class PyrusWebClient:
     def app(self) -> Application:
         if self._app:
             return self._app
-        self._app = Application(backend="uia").connect(title_re="Заявка.+")
+        assert self.uses_desktop, "No desktop window in headless mode"
+        # Several browsers may be open, attach to our own one
+        pid = self.browser_pid if self.profile_dir else None
+        if pid:
+            self._app = Application(backend="uia").connect(process=pid)
+        else:
+            self._app = Application(backend="uia").connect(
+                title_re="Заявка.+"
+            )
         return self._app
 
     @property
@@ -92,7 +254,114 @@ class PyrusWebClient:
         self._win = self.app.window(title_re="Заявка.+")
         return self._win
 
+    def is_logged_in(self) -> bool:
+        # Either the app shell or the login form settles the question, a
+        # half-loaded page proves neither
+        def current_page() -> str | None:
+            if self.driver.find_elements(By.CSS_SELECTOR, APP_SHELL):
+                return "app"
+            if self.driver.find_elements(By.ID, "p_email"):
+                return "login"
+            return None
+
+        self.navigate(PROBE_URL)
+        try:
+            page = self.wait_until(
+                current_page,
+                timeout=NAVIGATION_TIMEOUT,
+                name="Login probe",
+            )
+        except TimeoutException as e:
+            logger.warning(e)
+            return False
+        return page == "app" and "login" not in self.driver.current_url
+
+    def get_cookies(self) -> list[dict[str, Any]]:
+        try:
+            cookies = self.driver.execute_cdp_cmd("Network.getAllCookies", {})
+        except WebDriverException as e:
+            logger.warning(f"Failed to read browser cookies: {e}")
+            return []
+        return [
+            cookie
+            for cookie in cookies.get("cookies", [])
+            if cookie.get("domain", "").endswith(COOKIE_DOMAIN)
+        ]
+
+    def set_cookies(self, saved: list[dict[str, Any]]) -> bool:
+        now = time.time()
+        cookies = []
+        for cookie in saved:
+            expires = cookie.get("expires", -1)
+            if not cookie.get("session") and 0 < expires < now:
+                continue
+            params = {k: cookie[k] for k in COOKIE_FIELDS if k in cookie}
+            if not cookie.get("session") and expires > 0:
+                params["expires"] = expires
+            cookies.append(params)
+        if not cookies:
+            return False
+
+        try:
+            self.driver.execute_cdp_cmd(
+                "Network.setCookies", {"cookies": cookies}
+            )
+        except WebDriverException as e:
+            logger.warning(f"Failed to set browser cookies: {e}")
+            return False
+        return True
+
+    def import_session_cookies(self) -> bool:
+        if self.session is None:
+            return False
+        cookies = [
+            {
+                "name": cookie.name,
+                "value": cookie.value,
+                "domain": cookie.domain,
+                "path": cookie.path,
+                "secure": cookie.secure,
+                "httpOnly": cookie.has_nonstandard_attr("HttpOnly"),
+                "expires": cookie.expires or -1,
+                "session": cookie.expires is None,
+            }
+            for cookie in self.session.cookies
+            if cookie.domain.endswith(COOKIE_DOMAIN)
+        ]
+        if not self.set_cookies(cookies):
+            return False
+        logger.info(f"Copied {len(cookies)} cookies from the HTTP session")
+        return True
+
+    def export_session_cookies(self) -> None:
+        if self.session is None:
+            return
+        cookies = self.get_cookies()
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie["domain"],
+                path=cookie.get("path", "/"),
+                secure=cookie.get("secure", False),
+                expires=(
+                    None if cookie.get("session") else int(cookie["expires"])
+                ),
+                rest={"HttpOnly": None} if cookie.get("httpOnly") else {},
+            )
+        logger.info(f"Copied {len(cookies)} cookies to the HTTP session")
+
     def login(self) -> None:
+        with self.step("login"):
+            if self.is_logged_in():
+                logger.info("Reusing Pyrus browser session")
+            elif self.import_session_cookies() and self.is_logged_in():
+                logger.info("Reusing Pyrus HTTP session")
+            else:
+                self.login_with_password()
+            self.export_session_cookies()
+
+    def login_with_password(self) -> None:
         login_url = os.environ["PYRUS_LOGIN_URL"]
         email = os.environ["PYRUS_EMAIL"]
         password = os.environ["PYRUS_PASSWORD"]
@@ -114,118 +383,451 @@ class PyrusWebClient:
             )
         )
         password_field.send_keys(password)
-        self.actions.pause(1).send_keys(Keys.ENTER).pause(5).perform()
-
-    def is_task_approved(self) -> bool:
+        self.actions.pause(1).send_keys(Keys.ENTER).perform()
         try:
-            sidebar_reveal_btn = self.win.child_window(title="Развернуть сайдбар задачи", control_type="Button", found_index=0)
+            self.wait_until(
+                lambda: not self.driver.find_elements(
+                    By.CSS_SELECTOR, 'input[data-test-id="inputPassword"]'
+                ),
+                timeout=NAVIGATION_TIMEOUT,
+                name="Login",
+            )
+        except TimeoutException as e:
+            logger.error(e)
+        self.wait_network_idle()
+        logger.info("Pyrus browser login successful")
+
+    def navigate(self, url: str) -> None:
+        # UIA elements of the previous page go stale after navigation
+        self._elements.clear()
+        if self._driver:
+            # Resources of the previous task would read as activity
+            try:
+                self._driver.execute_script(
+                    "performance.clearResourceTimings()"
+                )
+            except WebDriverException as e:
+                logger.debug(f"Failed to clear resource timings: {e}")
+        self.driver.get(url)
+
+    def cached_element(
+        self, key: str, find: Callable[[], UIAWrapper | None]
+    ) -> UIAWrapper | None:
+        element = self._elements.get(key)
+        if element is not None:
+            try:
+                element.window_text()
+                return element
+            except Exception:
+                logger.debug(f"Cached element {key!r} is stale", exc_info=True)
+        element = find()
+        if element is not None:
+            self._elements[key] = element
+        return element
+
+    @property
+    def document(self) -> UIAWrapper:
+        element = self.cached_element(
+            "document",
+            lambda: self.win.child_window(
+                control_type="Document", found_index=0
+            ).wrapper_object(),
+        )
+        assert element, "document is None"
+        return element
 
-            siblings = sidebar_reveal_btn.parent().children()
+    @property
+    def sidebar_button(self) -> UIAWrapper | None:
+        return self.cached_element(
+            "sidebar_button",
+            lambda: next(
+                iter(self.find_ui(SIDEBAR_BUTTON, "Button", self.document)),
+                None,
+            ),
+        )
 
-            idx = siblings.index(sidebar_reveal_btn)
-            next_sibling = siblings[idx + 1] if idx + 1 < len(siblings) else None
+    @property
+    def sidebar(self) -> UIAWrapper:
+        element = self.cached_element("sidebar", self.find_sidebar)
+        assert element, "sidebar is None"
+        return element
+
+    def find_sidebar(self) -> UIAWrapper:
+        # Chrome exposes the id of an element as its UIA automation id, so
+        # the panel tagged through the DOM is found in a single lookup that
+        # skips the form and the browser toolbars
+        try:
+            panel_id = self.driver.execute_script(
+                """
+                const panel = document.querySelector(arguments[0]);
+                if (panel && !panel.id) {
+                    panel.id = arguments[1];
+                }
+                return panel ? panel.id : null;
+                """,
+                SIDEBAR_SELECTOR,
+                SIDEBAR_ID,
+            )
+            if panel_id:
+                return self.win.child_window(
+                    auto_id=panel_id, found_index=0
+                ).wrapper_object()
+        except (WebDriverException, ElementNotFoundError) as e:
+            logger.debug(f"Task sidebar lookup failed: {e}")
+        logger.debug("Task sidebar not found, searching the whole page")
+        return self.document
+
+    def find_ui(
+        self, title: str, control_type: str, scope: UIAWrapper | None = None
+    ) -> list[UIAWrapper]:
+        try:
+            root = scope or self.document
+            return root.descendants(title=title, control_type=control_type)
+        except Exception:
+            # Resolve the scope again on the next search
+            logger.debug(f"UIA search for {title!r} failed", exc_info=True)
+            self._elements.clear()
+            return []
 
-            is_approved = next((ch.window_text().strip() == "Утверждено" for ch in next_sibling.children()), False)
-            return is_approved
+    def is_task_approved(self) -> bool:
+        try:
+            sidebar_reveal_btn = self.sidebar_button
+            if sidebar_reveal_btn is None:
+                return False
+
+            def find_status() -> UIAWrapper | None:
+                assert sidebar_reveal_btn, "sidebar_reveal_btn is None"
+                siblings = sidebar_reveal_btn.parent().children()
+                idx = siblings.index(sidebar_reveal_btn)
+                return siblings[idx + 1] if idx + 1 < len(siblings) else None
+
+            status = self.cached_element("status", find_status)
+            if status is None:
+                return False
+            return any(
+                ch.window_text().strip() == "Утверждено"
+                for ch in status.children()
+            )
         except Exception as e:
             logger.error(e)
             logger.exception(e)
             return False
 
+    @contextmanager
+    def step(self, name: str) -> Generator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started_at
+            self._step_times[name] = elapsed
+            self.timings.setdefault(name, []).append(elapsed)
+
+    def wait_until(
+        self, condition: Callable[[], T | None], timeout: float, name: str
+    ) -> T:
+        deadline = time.monotonic() + timeout
+        delay = POLL_INITIAL
+        while True:
+            try:
+                result = condition()
+            except StaleElementReferenceException:
+                result = None
+            if result:
+                return result
+            if time.monotonic() >= deadline:
+                raise TimeoutException(f"{name} timed out after {timeout}s")
+            sleep(delay)
+            delay = min(delay * 2, POLL_MAX)
+
+    def wait_network_idle(
+        self, quiet: float = NETWORK_QUIET, timeout: float = IDLE_TIMEOUT
+    ) -> bool:
+        deadline = time.monotonic() + timeout
+        last = None
+        stable_since = time.monotonic()
+        while time.monotonic() < deadline:
+            pending, loaded = self.driver.execute_script(
+                NETWORK_HOOK
+                + "return [window.__avcNetwork.pending, "
+                + "performance.getEntriesByType('resource').length];"
+            )
+            now = time.monotonic()
+            if pending or (pending, loaded) != last:
+                last = (pending, loaded)
+                stable_since = now
+            elif now - stable_since >= quiet:
+                return True
+            sleep(POLL_INITIAL)
+        logger.debug(f"Network not idle after {timeout}s")
+        return False
+
+    def is_form_expanded(self) -> bool:
+        match = self.driver.find_elements(
+            By.CSS_SELECTOR, ".sideBySideRightContent"
+        )
+        if not match:
+            return False
+        class_names = str(match[0].get_property("className")) or ""
+        return "sideBySideRightContent_expanded" in class_names
+
+    def expand_form(self) -> None:
+        deadline = time.monotonic() + FORM_TIMEOUT
+        delay = POLL_INITIAL
+        while True:
+            try:
+                if self.is_form_expanded():
+                    return
+            except StaleElementReferenceException:
+                pass
+            if time.monotonic() >= deadline:
+                raise TimeoutException(
+                    f"Form expansion timed out after {FORM_TIMEOUT}s"
+                )
+            if self.driver.find_elements(
+                By.CSS_SELECTOR, ".sideBySideRightContent"
+            ):
+                self.actions.send_keys("f").perform()
+                if self.uses_desktop:
+                    with self.ui_lock:
+                        mouse.move((0, 0))
+            sleep(delay)
+            delay = min(delay * 2, POLL_MAX)
+
+    def is_file_attached(self, file_name: str) -> bool:
+        return bool(
+            self.driver.execute_script(
+                """
+                const label = [...document.querySelectorAll("span")].find(
+                    (span) => span.textContent === arguments[0]
+                );
+                const box = label?.closest("div")?.parentElement?.closest("div");
+                return !!box && box.textContent.includes(arguments[1]);
+                """,
+                ATTACHMENT_FIELD,
+                file_name,
+            )
+        )
+
+    def log_timings(self, task_id: int) -> None:
+        steps = ", ".join(
+            f"{name} {elapsed:.1f}s"
+            for name, elapsed in self._step_times.items()
+        )
+        logger.info(f"Task {task_id} timings: {steps}")
+        self._step_times = {}
+
+    def log_timings_report(self) -> None:
+        if not self.timings:
+            return
+        logger.info(f"Upload step timings ({self.mode!r} browser mode):")
+        for name, values in self.timings.items():
+            logger.info(
+                f"{name:<10} avg {sum(values) / len(values):.1f}s, max {max(values):.1f}s over {len(values)} tasks"
+            )
+
     def upload_file(
         self,
         task_id: int,
         file_path: Path,
     ) -> str | None:
-        url = f"https://pyrus.com/t#id{task_id}"
-        self.driver.get(url)
+        try:
+            return self._upload_file(task_id, file_path)
+        finally:
+            self.log_timings(task_id)
 
-        sleep(2)
+    def open_task(self, task_id: int) -> str | None:
+        url = f"https://pyrus.com/t#id{task_id}"
+        with self.step("navigate"):
+            self.navigate(url)
+            try:
+                self.wait_until(
+                    lambda: self.driver.find_elements(
+                        By.CSS_SELECTOR, ".sideBySideRightContent"
+                    ),
+                    timeout=NAVIGATION_TIMEOUT,
+                    name="Task page",
+                )
+            except TimeoutException as e:
+                logger.error(e)
+                return "Загрузка файла: страница задачи не загрузилась\n"
 
-        form_expanded = False
-        while not form_expanded:
-            match = self.driver.find_elements(
-                By.CSS_SELECTOR, ".sideBySideRightContent"
-            )
-            if not match:
-                sleep(0.5)
-                continue
-            sidebar = match[0]
+        with self.step("expand"):
             try:
-                class_names = str(sidebar.get_property("className")) or ""
-            except StaleElementReferenceException:
-                sleep(0.5)
-                continue
-            form_expanded = "sideBySideRightContent_expanded" in class_names
-            if form_expanded:
-                break
-            self.actions.send_keys("f").perform()
-            mouse.move((0, 0))
+                self.expand_form()
+            except TimeoutException as e:
+                logger.error(e)
+                return "Загрузка файла: форма задачи не открылась\n"
+        return None
 
-        is_approved = self.is_task_approved() and self.is_task_approved()
+    def _upload_file(
+        self,
+        task_id: int,
+        file_path: Path,
+    ) -> str | None:
+        note = self.open_task(task_id)
+        if note:
+            return note
+
+        with self.step("check"):
+            if self.uses_desktop:
+                with self.ui_lock:
+                    is_approved = (
+                        self.is_task_approved() and self.is_task_approved()
+                    )
+            else:
+                is_approved = self.is_task_approved_dom()
+        if is_approved is None:
+            # Uploading blind could attach a second copy to an approved task
+            logger.error(f"Approval status of task {task_id} not found")
+            return "Загрузка файла: не удалось определить статус задачи\n"
         if is_approved:
             return None
 
-        try:
-            self.wait.until(
-                ec.presence_of_element_located(
-                    (
-                        By.XPATH,
-                        "(//span[text() = '5. Вложение платежного поручения']//ancestor::div[2])[1]//div[text() = 'Загрузить файл']/following::input[1]",
+        with self.step("attach"):
+            try:
+                self.wait.until(
+                    ec.presence_of_element_located(
+                        (
+                            By.XPATH,
+                            f"(//span[text() = '{ATTACHMENT_FIELD}']//ancestor::div[2])[1]//div[text() = 'Загрузить файл']/following::input[1]",
+                        )
                     )
+                ).send_keys(str(file_path))
+            except Exception as e:
+                logger.error(e)
+                pass
+
+        with self.step("upload"):
+            try:
+                self.wait_until(
+                    lambda: self.is_file_attached(file_path.name),
+                    timeout=UPLOAD_TIMEOUT,
+                    name="File upload",
                 )
-            ).send_keys(str(file_path))
-        except Exception as e:
+            except TimeoutException as e:
+                # Saving now would approve the task without the file
+                logger.error(e)
+                return "Загрузка файла: файл не загрузился\n"
+            self.wait_network_idle()
+
+        if not self.uses_desktop:
+            return self.save_and_approve_dom(task_id)
+        with self.ui_lock:
+            return self.save_and_approve(task_id)
+
+    def is_task_approved_dom(self) -> bool | None:
+        # None when the status element is not on the page
+        return self.driver.execute_script(
+            """
+            const label = arguments[0];
+            const btn = document.querySelector(
+                `[aria-label="${label}"], [title="${label}"]`
+            );
+            const next = btn?.nextElementSibling;
+            if (!next) {
+                return null;
+            }
+            return [...next.children].some(
+                (child) => child.textContent.trim() === "Утверждено"
+            );
+            """,
+            SIDEBAR_BUTTON,
+        )
+
+    def find_by_text(self, text: str, tag: str = "*") -> list[WebElement]:
+        return self.driver.find_elements(
+            By.XPATH, f"//{tag}[normalize-space(text()) = '{text}']"
+        )
+
+    def save_and_approve_dom(self, task_id: int) -> str | None:
+        try:
+            with self.step("save"):
+                save_btn = self.wait_until(
+                    lambda: self.find_by_text("Сохранить", "button")
+                    or self.find_by_text("Сохранить"),
+                    timeout=UI_TIMEOUT,
+                    name="Save button",
+                )[0]
+                self.driver.execute_script("arguments[0].click()", save_btn)
+                logger.info(f"Task {task_id} saved")
+                self.wait_network_idle()
+        except (TimeoutException, WebDriverException) as e:
             logger.error(e)
-            pass
 
-        sleep(2)
+        try:
+            with self.step("approve"):
+                approve_btn = self.wait_until(
+                    lambda: self.find_by_text("Утвердить"),
+                    timeout=UI_TIMEOUT,
+                    name="Approve button",
+                )[0]
+                self.driver.execute_script(
+                    "arguments[0].click()", approve_btn
+                )
+            with self.step("approved"):
+                self.wait_until(
+                    lambda: self.find_by_text("Утверждено")
+                    and not self.find_by_text("Утвердить"),
+                    timeout=UI_TIMEOUT,
+                    name="Approval",
+                )
+                logger.info(f"Task {task_id} approved")
+                self.wait_network_idle()
+        except (TimeoutException, WebDriverException) as e:
+            logger.error(e)
 
+        if not self.find_by_text("Должно быть заполнено"):
+            return None
+        return "Загрузка файла: одно или несколько полей не были заполнены. Невозможно утвердить задачу\n"
+
+    def save_and_approve(self, task_id: int) -> str | None:
         self.win.set_focus()
 
-        save_btn = None
         try:
-            save_btn = self.win.child_window(
-                title="Сохранить", control_type="Button"
-            )
-            save_btn.wait(wait_for="exists", timeout=30)
-            save_btn.click_input()
-            logger.info(f"Task {task_id} saved")
-            sleep(2)
+            with self.step("save"):
+                save_btn = self.wait_until(
+                    lambda: self.find_ui("Сохранить", "Button", self.sidebar),
+                    timeout=UI_TIMEOUT,
+                    name="Save button",
+                )[0]
+                save_btn.click_input()
+                logger.info(f"Task {task_id} saved")
+                self.wait_network_idle()
         except Exception as e:
             logger.error(e)
             pass
 
-        approve_btn = None
         try:
-            approve_btn = self.win.child_window(
-                title="Утвердить", control_type="Text"
-            )
-            approve_btn.wait(wait_for="exists", timeout=30)
-            approve_btn_coords = get_center(approve_btn)
-            mouse.move(coords=approve_btn_coords)
-            mouse.click(coords=approve_btn_coords)
+            with self.step("approve"):
+                approve_btn = self.wait_until(
+                    lambda: self.find_ui("Утвердить", "Text", self.sidebar),
+                    timeout=UI_TIMEOUT,
+                    name="Approve button",
+                )[0]
+                approve_btn_coords = get_center(approve_btn)
+                mouse.move(coords=approve_btn_coords)
+                mouse.click(coords=approve_btn_coords)
         except Exception as e:
             logger.error(e)
             pass
 
         try:
-            if approve_btn:
-                approve_btn.wait_not(wait_for_not="exists")
-            else:
-                approve_btn = self.win.child_window(
-                    title="Утвердить", control_type="Text"
+            with self.step("approved"):
+                self.wait_until(
+                    lambda: not self.find_ui(
+                        "Утвердить", "Text", self.sidebar
+                    )
+                    and self.find_ui("Утверждено", "Text", self.sidebar),
+                    timeout=UI_TIMEOUT,
+                    name="Approval",
                 )
-                if approve_btn.exists():
-                    approve_btn.wait_not(wait_for_not="exists")
-            self.win.child_window(title="Утверждено", control_type="Text", found_index=0).wait(wait_for="exists")
-            logger.info(f"Task {task_id} approved")
-            sleep(5)
+                logger.info(f"Task {task_id} approved")
+                self.wait_network_idle()
         except Exception as e:
             logger.error(e)
-            warnings = self.win.descendants(
-                title="Должно быть заполнено", control_type="Text"
-            )
+            # Field warnings are in the form body, outside the sidebar scope
+            warnings = self.find_ui("Должно быть заполнено", "Text")
             if warnings:
                 return (
                     f"Загрузка файла: одно или несколько полей не были заполнены. Невозможно утвердить задачу\n"
@@ -233,9 +835,7 @@ class PyrusWebClient:
             else:
                 logger.error(e)
 
-        warnings = self.win.descendants(
-            title="Должно быть заполнено", control_type="Text"
-        )
+        warnings = self.find_ui("Должно быть заполнено", "Text")
         if not warnings:
             return None
 
@@ -259,6 +859,8 @@ class PyrusWebClient:
         __: BaseException | None,
         ___: TracebackType | None,
     ) -> bool:
+        self.log_timings_report()
+        self._elements.clear()
         if self._driver:
             self._driver.quit()
             self._driver = None
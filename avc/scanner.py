@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import closing
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from avc.logger import get_logger
+from avc.storage import LocalStorage
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Generator
+    from concurrent.futures import Future
+    from threading import Event
+
+    from avc.storage import StorageEntry
+
+logger = get_logger("avc")
+
+
+MAX_WORKERS = 8
+
+
+class ScanEntry(NamedTuple):
+    path: str
+    name: str
+    depth: int
+    is_dir: bool
+    size: int
+    mtime: float
+
+
+def scan(
+    root: Path | str,
+    max_depth: int = 0,
+    descend: Callable[[ScanEntry], bool] | None = None,
+    max_workers: int = MAX_WORKERS,
+    stop: Event | None = None,
+    listdir: Callable[[str], list[StorageEntry]] | None = None,
+) -> Generator[ScanEntry]:
+    listdir = listdir or LocalStorage().listdir
+
+    def list_entries(path: str, depth: int) -> list[ScanEntry]:
+        try:
+            return [
+                ScanEntry(
+                    path=os.path.join(path, entry.name),
+                    name=entry.name,
+                    depth=depth,
+                    is_dir=entry.is_dir,
+                    size=entry.size,
+                    mtime=entry.mtime,
+                )
+                for entry in listdir(path)
+            ]
+        except (OSError, PermissionError) as e:
+            logger.debug(f"Failed to list {path!r}: {e}")
+            return []
+
+    executor = ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="scan"
+    )
+    pending: set[Future[list[ScanEntry]]] = {
+        executor.submit(list_entries, str(root), 0)
+    }
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for entry in future.result():
+                    if stop and stop.is_set():
+                        return
+                    yield entry
+
+                    if not entry.is_dir or entry.depth >= max_depth:
+                        continue
+                    if descend and not descend(entry):
+                        continue
+                    pending.add(
+                        executor.submit(
+                            list_entries, entry.path, entry.depth + 1
+                        )
+                    )
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def find_first_dir(
+    root: Path | str,
+    predicate: Callable[[str], bool],
+    max_depth: int = 0,
+    max_workers: int = MAX_WORKERS,
+    listdir: Callable[[str], list[StorageEntry]] | None = None,
+) -> Path | None:
+    entries = scan(
+        root, max_depth=max_depth, max_workers=max_workers, listdir=listdir
+    )
+    with closing(entries):
+        for entry in entries:
+            if entry.is_dir and predicate(entry.name):
+                return Path(entry.path)
+    return None
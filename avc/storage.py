@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import os
+import shutil
+import stat
+import xml.etree.ElementTree as ET
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple, Protocol
+from urllib.parse import quote, unquote, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from avc.logger import get_logger
+
+if TYPE_CHECKING:
+    from types import TracebackType
+    from typing import Self
+
+logger = get_logger("avc")
+
+
+DAV_NS = "{DAV:}"
+PROPFIND_BODY = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<d:propfind xmlns:d="DAV:"><d:prop>'
+    "<d:resourcetype/><d:getcontentlength/><d:getlastmodified/>"
+    "</d:prop></d:propfind>"
+)
+
+
+class StorageEntry(NamedTuple):
+    name: str
+    is_dir: bool
+    size: int
+    mtime: float
+
+
+class Storage(Protocol):
+    def stat(self, path: Path | str) -> StorageEntry | None: ...
+
+    def exists(self, path: Path | str) -> bool: ...
+
+    def listdir(self, path: Path | str) -> list[StorageEntry]: ...
+
+    def mkdir(self, path: Path | str) -> None: ...
+
+    def move(self, src: Path | str, dst: Path | str) -> None: ...
+
+    def copy_to_local(self, src: Path | str, dst: Path) -> None: ...
+
+    def copy_from_local(self, src: Path, dst: Path | str) -> None: ...
+
+
+class LocalStorage:
+    def stat(self, path: Path | str) -> StorageEntry | None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return StorageEntry(
+            name=Path(path).name,
+            is_dir=stat.S_ISDIR(st.st_mode),
+            size=st.st_size,
+            mtime=st.st_mtime,
+        )
+
+    def exists(self, path: Path | str) -> bool:
+        return os.path.exists(path)
+
+    def listdir(self, path: Path | str) -> list[StorageEntry]:
+        result: list[StorageEntry] = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                st = entry.stat(follow_symlinks=False)
+                result.append(
+                    StorageEntry(
+                        name=entry.name,
+                        is_dir=entry.is_dir(follow_symlinks=False),
+                        size=st.st_size,
+                        mtime=st.st_mtime,
+                    )
+                )
+        return result
+
+    def mkdir(self, path: Path | str) -> None:
+        Path(path).mkdir(exist_ok=True, parents=True)
+
+    def move(self, src: Path | str, dst: Path | str) -> None:
+        shutil.move(src, dst)
+
+    def copy_to_local(self, src: Path | str, dst: Path) -> None:
+        shutil.copy2(src, dst)
+
+    def copy_from_local(self, src: Path, dst: Path | str) -> None:
+        shutil.copy2(src, dst)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        _: type[BaseException] | None,
+        __: BaseException | None,
+        ___: TracebackType | None,
+    ) -> bool:
+        return False
+
+
+class WebDavStorage:
+    def __init__(
+        self,
+        base_url: str,
+        user: str,
+        password: str,
+        root: Path | str = "N:\\",
+        pool_size: int = 8,
+        timeout: float = 60,
+    ) -> None:
+        self.base_url: str = base_url.rstrip("/")
+        self.root: Path = Path(root)
+        self.timeout: float = timeout
+
+        self.session: requests.Session = requests.Session()
+        self.session.auth = (user, password)
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, path: Path | str) -> str:
+        parts = Path(path).relative_to(self.root).parts
+        return "/".join([self.base_url, *(quote(part) for part in parts)])
+
+    def request(
+        self,
+        method: str,
+        path: Path | str,
+        ok_statuses: tuple[int, ...] = (),
+        **kwargs: Any,
+    ) -> requests.Response:
+        try:
+            response = self.session.request(
+                method, self.url(path), timeout=self.timeout, **kwargs
+            )
+            if response.status_code == 404:
+                raise FileNotFoundError(str(path))
+            if response.status_code not in ok_statuses:
+                response.raise_for_status()
+        except requests.RequestException as e:
+            raise OSError(f"WebDAV {method} {str(path)!r} failed: {e}") from e
+        return response
+
+    def propfind(
+        self, path: Path | str, depth: int
+    ) -> tuple[StorageEntry | None, list[StorageEntry]]:
+        url = self.url(path)
+        response = self.request(
+            "PROPFIND",
+            path,
+            data=PROPFIND_BODY.encode("utf-8"),
+            headers={
+                "Depth": str(depth),
+                "Content-Type": "application/xml; charset=utf-8",
+            },
+        )
+
+        self_href = unquote(urlsplit(url).path).rstrip("/")
+        current = None
+        children: list[StorageEntry] = []
+        try:
+            root = ET.fromstring(response.content)
+        except ET.ParseError as e:
+            raise OSError(f"Invalid PROPFIND response for {str(path)!r}") from e
+        for item in root.iter(f"{DAV_NS}response"):
+            href = unquote(urlsplit(item.findtext(f"{DAV_NS}href", "")).path)
+            href = href.rstrip("/")
+            prop = item.find(f"{DAV_NS}propstat/{DAV_NS}prop")
+            if prop is None:
+                continue
+
+            resource_type = prop.find(f"{DAV_NS}resourcetype")
+            modified = prop.findtext(f"{DAV_NS}getlastmodified")
+            entry = StorageEntry(
+                name=href.rsplit("/", maxsplit=1)[-1],
+                is_dir=(
+                    resource_type is not None
+                    and resource_type.find(f"{DAV_NS}collection") is not None
+                ),
+                size=int(prop.findtext(f"{DAV_NS}getcontentlength") or 0),
+                mtime=(
+                    parsedate_to_datetime(modified).timestamp()
+                    if modified
+                    else 0.0
+                ),
+            )
+            if href == self_href:
+                current = entry
+            else:
+                children.append(entry)
+        return current, children
+
+    def stat(self, path: Path | str) -> StorageEntry | None:
+        try:
+            current, _ = self.propfind(path, depth=0)
+        except FileNotFoundError:
+            return None
+        return current
+
+    def exists(self, path: Path | str) -> bool:
+        return self.stat(path) is not None
+
+    def listdir(self, path: Path | str) -> list[StorageEntry]:
+        _, children = self.propfind(path, depth=1)
+        return children
+
+    def mkdir(self, path: Path | str) -> None:
+        path = Path(path)
+        missing: list[Path] = []
+        while path != self.root and not self.exists(path):
+            missing.append(path)
+            path = path.parent
+
+        for folder in reversed(missing):
+            self.request("MKCOL", folder, ok_statuses=(405,))
+
+    def move(self, src: Path | str, dst: Path | str) -> None:
+        self.request(
+            "MOVE",
+            src,
+            headers={"Destination": self.url(dst), "Overwrite": "T"},
+        )
+
+    def copy_to_local(self, src: Path | str, dst: Path) -> None:
+        with self.request("GET", src, stream=True) as response:
+            try:
+                with dst.open("wb") as f:
+                    for chunk in response.iter_content(chunk_size=1 << 16):
+                        f.write(chunk)
+            except requests.RequestException as e:
+                raise OSError(f"WebDAV GET {str(src)!r} failed: {e}") from e
+
+    def copy_from_local(self, src: Path, dst: Path | str) -> None:
+        with src.open("rb") as f:
+            self.request("PUT", dst, data=f)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        _: type[BaseException] | None,
+        __: BaseException | None,
+        ___: TracebackType | None,
+    ) -> bool:
+        self.session.close()
+        return False
+
+
+def get_storage() -> LocalStorage | WebDavStorage:
+    backend = os.environ.get("STORAGE_BACKEND", "local")
+    logger.info(f"Using storage backend: {backend!r}")
+    if backend == "webdav":
+        return WebDavStorage(
+            base_url=os.environ["WEBDAV_URL"],
+            user=os.environ["WEBDAV_USER"],
+            password=os.environ["WEBDAV_PASSWORD"],
+            root=os.environ.get("WEBDAV_ROOT", "N:\\"),
+        )
+    return LocalStorage()
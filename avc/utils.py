@@ -4,22 +4,25 @@ import base64
 import csv
 import json
 import os
-import shutil
 import subprocess
+import threading
 from dataclasses import dataclass
+from datetime import date, timedelta
 from pathlib import Path
 from typing import TYPE_CHECKING
 
-import pandas as pd
 import requests
+from openpyxl import Workbook
 
 from avc.logger import get_logger
+from avc.storage import LocalStorage
 
 if TYPE_CHECKING:
     from types import TracebackType
-    from typing import Any, Self
+    from typing import Any, Self, TextIO
 
     from avc.models import PyrusEntry
+    from avc.storage import Storage
 
 logger = get_logger("avc")
 
@@ -28,6 +31,7 @@ logger = get_logger("avc")
 class Result:
     ok: bool = True
     message: str | None = None
+    outcome: str | None = None
 
     def __bool__(self) -> bool:
         return self.ok
@@ -46,12 +50,101 @@ def find_project_root() -> Path:
     raise FileNotFoundError("Project root not found")
 
 
-def get_processed_tasks(robot_log_path: Path) -> list[str]:
+TASK_URL_PREFIX = "https://pyrus.com/t#id"
+LOOKBACK_DAYS = 7
+
+
+def robot_log_path_for(logs_folder: Path, day: date) -> Path:
+    return (
+        logs_folder / day.strftime("%Y-%m") / f"{day.strftime('%Y.%m.%d')}.csv"
+    )
+
+
+def read_logged_tasks(robot_log_path: Path) -> set[int]:
+    tasks: set[int] = set()
     if not robot_log_path.exists():
-        return []
-    df = pd.read_csv(robot_log_path, delimiter=";", header=None)
-    uploaded_tasks = list(set(list(df.loc[~df[0].isna(), 0])))
-    return uploaded_tasks
+        return tasks
+    with robot_log_path.open("r", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f, delimiter=";"):
+            if not row or not row[0].startswith(TASK_URL_PREFIX):
+                continue
+            try:
+                tasks.add(int(row[0].removeprefix(TASK_URL_PREFIX)))
+            except ValueError:
+                continue
+    return tasks
+
+
+class ProcessedTaskIndex:
+    def __init__(
+        self,
+        file_path: Path,
+        today: date | None = None,
+        lookback_days: int = LOOKBACK_DAYS,
+    ) -> None:
+        self.file_path: Path = file_path
+        self.today: date = today or date.today()
+        self.since: date = self.today - timedelta(days=lookback_days)
+
+        self._tasks: set[int] = set()
+        self._lock: threading.Lock = threading.Lock()
+
+        self.load()
+
+    def load(self) -> None:
+        if not self.file_path.exists():
+            return
+        live: list[str] = []
+        expired = 0
+        with self.file_path.open("r", encoding="utf-8") as f:
+            for line in f:
+                task_id, _, day = line.strip().partition(";")
+                try:
+                    if date.fromisoformat(day) < self.since:
+                        expired += 1
+                        continue
+                    self._tasks.add(int(task_id))
+                except ValueError:
+                    expired += 1
+                    continue
+                live.append(line)
+
+        # Keep the append-only file from growing past the look-back window
+        if expired > len(live):
+            tmp_path = self.file_path.with_suffix(".tmp")
+            with tmp_path.open("w", encoding="utf-8") as f:
+                f.writelines(live)
+            tmp_path.replace(self.file_path)
+
+        logger.info(
+            f"Loaded {len(self._tasks)} processed tasks since {self.since.isoformat()}"
+        )
+
+    def seed_from_logs(self, logs_folder: Path) -> None:
+        if self.file_path.exists():
+            return
+        tasks: set[int] = set()
+        day = self.since
+        while day <= self.today:
+            tasks |= read_logged_tasks(robot_log_path_for(logs_folder, day))
+            day += timedelta(days=1)
+        for task_id in sorted(tasks):
+            self.add(task_id)
+
+    def add(self, task_id: int) -> None:
+        with self._lock:
+            if task_id in self._tasks:
+                return
+            self._tasks.add(task_id)
+            self.file_path.parent.mkdir(exist_ok=True, parents=True)
+            with self.file_path.open("a", encoding="utf-8") as f:
+                f.write(f"{task_id};{self.today.isoformat()}\n")
+
+    def __contains__(self, task_id: object) -> bool:
+        return task_id in self._tasks
+
+    def __len__(self) -> int:
+        return len(self._tasks)
 
 
 def attach_network_drive(remote_path: Path) -> None:
@@ -104,10 +197,42 @@ def attach_network_drive(remote_path: Path) -> None:
         raise RuntimeError(f"Not accessible: {remote_path.as_posix()!r}")
 
 
+PATH_COLUMN = 11
+MOVED_COLUMN = 14
+NOTE_COLUMN = 15
+AMOUNT_COLUMN = 7
+
+FLUSH_EVERY = 20
+
+
+def xlsx_value(idx: int, value: str) -> str | float | None:
+    if not value:
+        return None
+    if idx == AMOUNT_COLUMN:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
 class LogWriter:
-    def __init__(self, file_path: Path) -> None:
+    def __init__(
+        self,
+        file_path: Path,
+        publish_folder: Path | None = None,
+        storage: Storage | None = None,
+    ) -> None:
         self.file_path: Path = file_path
         self.file_path.parent.mkdir(exist_ok=True, parents=True)
+        self.publish_folder: Path | None = publish_folder
+        self.storage: Storage = storage or LocalStorage()
+
+        self._lock: threading.Lock = threading.Lock()
+        self._file: TextIO | None = None
+        self._writer: Any = None
+        self._pending: int = 0
+        self._keys: set[tuple[str, ...]] = set()
 
         self.headers: list[str] = [
             "Ссылка",
@@ -128,6 +253,64 @@ class LogWriter:
             "Заметки",
         ]
 
+        self.load()
+
+    def load(self) -> None:
+        if not self.file_path.exists():
+            return
+        with self.file_path.open("r", encoding="utf-8", newline="") as f:
+            for row in csv.reader(f, delimiter=";"):
+                self._keys.add(tuple(row))
+
+    def open(self) -> None:
+        if self._file:
+            return
+        self._file = self.file_path.open("a", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file, delimiter=";")
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file:
+                self._file.flush()
+            self._pending = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file:
+                self._file.close()
+            self._file = None
+            self._writer = None
+            self._pending = 0
+
+    def write_xlsx(self) -> Path:
+        xlsx_file_path = self.file_path.with_suffix(".xlsx")
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(self.headers)
+
+        seen: set[tuple[str, ...]] = set()
+        with self.file_path.open("r", encoding="utf-8", newline="") as f:
+            for row in csv.reader(f, delimiter=";"):
+                key = tuple(row)
+                if key in seen:
+                    continue
+                seen.add(key)
+                ws.append([xlsx_value(idx, v) for idx, v in enumerate(row)])
+
+        wb.save(xlsx_file_path)
+        return xlsx_file_path
+
+    def publish(self, xlsx_file_path: Path) -> None:
+        if not self.publish_folder:
+            return
+        try:
+            self.storage.copy_from_local(
+                xlsx_file_path, self.publish_folder / xlsx_file_path.name
+            )
+            logger.info(f"Log published: {xlsx_file_path.name!r}")
+        except OSError:
+            logger.exception(f"Failed to publish {xlsx_file_path.name!r}")
+
     def __enter__(self) -> Self:
         return self
 
@@ -137,30 +320,22 @@ class LogWriter:
         __: BaseException | None,
         ___: TracebackType | None,
     ) -> bool:
-        if self.file_path.exists():
-            df = pd.read_csv(self.file_path, sep=";", header=None)
-            df = df.drop_duplicates()
-            df.to_csv(
-                self.file_path,
-                sep=";",
-                index=False,
-                header=False,
-                encoding="utf-8",
-            )
-            xlsx_file_path = self.file_path.with_suffix(".xlsx")
-            df.to_excel(
-                xlsx_file_path,
-                index=False,
-                header=self.headers,
-            )
-            try:
-                shutil.copy(xlsx_file_path, fr"N:\Общие диски\F. Платежи\Логи\{xlsx_file_path.name}")
-            except Exception as e:
-                logger.error(e)
-                logger.exception(e)
+        self.close()
+        if not self.file_path.exists():
+            return False
+
+        try:
+            xlsx_file_path = self.write_xlsx()
+        except Exception as e:
+            logger.error(e)
+            logger.exception(e)
+            return False
+
+        # Published before the storage it goes through is closed
+        self.publish(xlsx_file_path)
         return False
 
-    def append_record(
+    def build_record(
         self,
         pdf_file_path: Path,
         note: str,
@@ -168,8 +343,8 @@ class LogWriter:
         found_in_pyrus: bool = False,
         uploaded_to_pyrus: bool = False,
         moved_file: bool = False,
-    ) -> None:
-        url = f"https://pyrus.com/t#id{entry.task_id}" if entry else ""
+    ) -> list[Any]:
+        url = f"{TASK_URL_PREFIX}{entry.task_id}" if entry else ""
         row = [
             url,
             entry.project_id if entry else "",
@@ -188,7 +363,38 @@ class LogWriter:
             "Да" if moved_file else "Нет",
             note,
         ]
+        return row
+
+    def write_record(self, row: list[Any]) -> None:
+        # Compare the way the row reads back from the CSV
+        key = tuple("" if v is None else str(v) for v in row)
+        with self._lock:
+            if key in self._keys:
+                return
+            self._keys.add(key)
+            self.open()
+            assert self._file, "file is None"
+            self._writer.writerow(row)
+            self._pending += 1
+            if self._pending >= FLUSH_EVERY:
+                self._file.flush()
+                self._pending = 0
 
-        with open(self.file_path, "a", encoding="utf-8") as f:
-            writer = csv.writer(f, delimiter=";")
-            writer.writerow(row)
+    def append_record(
+        self,
+        pdf_file_path: Path,
+        note: str,
+        entry: PyrusEntry | None = None,
+        found_in_pyrus: bool = False,
+        uploaded_to_pyrus: bool = False,
+        moved_file: bool = False,
+    ) -> None:
+        row = self.build_record(
+            pdf_file_path=pdf_file_path,
+            note=note,
+            entry=entry,
+            found_in_pyrus=found_in_pyrus,
+            uploaded_to_pyrus=uploaded_to_pyrus,
+            moved_file=moved_file,
+        )
+        self.write_record(row)
@@ -0,0 +1,82 @@
+import gc
+import random
+import tracemalloc
+from datetime import datetime
+
+from avc.entry_table import EntryTable
+from avc.logger import get_logger
+from avc.models import CONTRAGENT_CATALOG, PyrusEntry
+
+logger = get_logger("avc")
+
+
+def benchmark_memory(count: int = 50_000) -> None:
+    def copy(s: str) -> str:
+        return (s + ".")[:-1]
+
+    rnd = random.Random(0)
+    payers = list(CONTRAGENT_CATALOG.keys())
+    banks = ['АО "Народный Банк Казахстана"', 'АО "Bereke Bank"', "SWIFT"]
+
+    def make_entry(idx: int) -> PyrusEntry:
+        return PyrusEntry(
+            task_id=200_000_000 + idx,
+            stage=copy("5"),
+            project_id=copy(f"{rnd.randint(1, 999):03}-25"),
+            initiator_id=rnd.randint(1_000_000, 1_000_100),
+            initiator_name=copy(f"Инициатор {rnd.randint(1, 100)}"),
+            contragent=copy(f'ТОО "Контрагент {rnd.randint(1, 2000)}"'),
+            contragent_bin=copy(f"{rnd.randint(1, 2000):012}"),
+            contragent2=None,
+            contragent_bin2=None,
+            payer=copy(rnd.choice(payers)),
+            payment_group=copy("Оплата поставщикам"),
+            payment_purpose=copy("Оплата за товар"),
+            kbk=copy("710"),
+            kbe=copy("17"),
+            country=copy("Казахстан"),
+            email=None,
+            phone_number=None,
+            account_number=copy(f"KZ{rnd.randint(0, 10**18):018}"),
+            bank=copy(rnd.choice(banks)),
+            bik=copy("HSBKKZKX"),
+            amount=rnd.randint(1_000, 10_000_000) / 100,
+            currency=copy("KZT"),
+            invoice_date=datetime(2025, rnd.randint(1, 12), rnd.randint(1, 28)),
+            desired_date=datetime(
+                2025, rnd.randint(1, 12), rnd.randint(1, 28), 5
+            ),
+            contract_info=copy(f"Договор № {rnd.randint(1, 5000)}"),
+            description=copy("Краткое описание"),
+            account_id=copy(str(rnd.randint(1, 99999))),
+        )
+
+    tracemalloc.start()
+    entries = [make_entry(idx) for idx in range(count)]
+    entries_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    last = entries[-1]
+    del entries
+
+    # Build from fresh entries inside the trace and drop them, so strings
+    # the table keeps are counted against it and only retained memory is
+    # compared
+    rnd.seed(0)
+    tracemalloc.start()
+    entries = [make_entry(idx) for idx in range(count)]
+    table = EntryTable(entries)
+    del entries
+    gc.collect()
+    table_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert table[count - 1] == last
+
+    logger.info(f"Entries: {count}")
+    logger.info(f"list[PyrusEntry]: {entries_bytes / 2**20:.1f} MiB")
+    logger.info(f"EntryTable:       {table_bytes / 2**20:.1f} MiB")
+    logger.info(f"Ratio:            {entries_bytes / table_bytes:.1f}x")
+
+
+if __name__ == "__main__":
+    benchmark_memory()
@@ -0,0 +1,47 @@
+import sys
+
+from avc.logger import get_logger
+from avc.pyrus_selenium import BROWSER_MODES, PyrusWebClient
+from avc.utils import find_project_root
+from dotenv import load_dotenv
+
+logger = get_logger("avc")
+
+
+def benchmark_page_load(
+    task_ids: list[int], modes: tuple[str, ...] = BROWSER_MODES
+) -> None:
+    project_folder = find_project_root()
+    load_dotenv()
+    resources_folder = project_folder / "resources"
+
+    for mode in modes:
+        client = PyrusWebClient(
+            driver_path=resources_folder / "chromedriver.exe",
+            chrome_path=resources_folder / "chrome-win64" / "chrome.exe",
+            profile_dir=project_folder
+            / "data"
+            / "chrome-profiles"
+            / f"benchmark-{mode}",
+            mode=mode,
+        )
+        averages: dict[str, float] = {}
+        with client:
+            client.login()
+            for task_id in task_ids:
+                note = client.open_task(task_id)
+                if note:
+                    logger.warning(f"{mode}: task {task_id}: {note.strip()}")
+                client.log_timings(task_id)
+
+            averages = {
+                name: sum(times) / len(times)
+                for name, times in client.timings.items()
+                if name in ("navigate", "expand")
+            }
+        timings = ", ".join(f"{k} {v:.2f}s" for k, v in averages.items())
+        logger.info(f"{mode:<8}: {timings}")
+
+
+if __name__ == "__main__":
+    benchmark_page_load([int(arg) for arg in sys.argv[1:]])
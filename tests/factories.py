@@ -0,0 +1,56 @@
+import random
+from datetime import datetime, timedelta
+
+from avc.models import CONTRAGENT_CATALOG, PyrusEntry
+from avc.pdf_parser import PaymentOrder
+
+PAYERS = list(CONTRAGENT_CATALOG)[:5]
+BINS = [f"{i:012}" for i in range(30)]
+AMOUNTS = [100.0, 250.5, 1000.0, 99.99, 1000.01]
+ACCOUNT_IDS = ["", "12", "123", "45", "A-7", "77"]
+PURPOSES = ["оплата по счету 123", "счет 45 и 77", "", "A-7", "без счета"]
+
+
+def make_entry(rnd: random.Random, idx: int) -> PyrusEntry:
+    contragent_bin = rnd.choice(BINS)
+    return PyrusEntry(
+        task_id=1000 + idx,
+        stage="5",
+        project_id=f"{rnd.randint(1, 50):03}-25",
+        initiator_id=1,
+        initiator_name="Инициатор",
+        contragent='ТОО "Контрагент"',
+        contragent_bin=contragent_bin if rnd.random() < 0.8 else None,
+        contragent2=None,
+        contragent_bin2=contragent_bin if rnd.random() < 0.5 else None,
+        payer=rnd.choice(PAYERS),
+        payment_group=None,
+        payment_purpose=None,
+        kbk=None,
+        kbe="17",
+        country="Казахстан",
+        email=None,
+        phone_number=None,
+        account_number=None,
+        bank=None,
+        bik=None,
+        amount=rnd.choice([None, *AMOUNTS]),
+        currency="KZT",
+        invoice_date=None,
+        desired_date=datetime(2025, 1, 1) + timedelta(days=rnd.randint(0, 60)),
+        contract_info="",
+        description="",
+        account_id=rnd.choice(ACCOUNT_IDS),
+    )
+
+
+def make_order(rnd: random.Random) -> PaymentOrder:
+    return PaymentOrder(
+        days_old=0,
+        payer=rnd.choice(PAYERS),
+        benificiary='ТОО "Контрагент"',
+        amount=rnd.choice([*AMOUNTS, 1000.02]),
+        value_date=datetime(2025, 1, 1) + timedelta(days=rnd.randint(0, 60)),
+        iin=rnd.choice(BINS),
+        payment_purpose=rnd.choice(PURPOSES),
+    )
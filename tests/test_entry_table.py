@@ -0,0 +1,19 @@
+import random
+
+from avc.entry_table import EntryTable
+
+from tests.factories import make_entry
+
+
+def test_entry_table_round_trip() -> None:
+    rnd = random.Random(0)
+    entries = [make_entry(rnd, idx) for idx in range(200)]
+
+    table = EntryTable(entries)
+
+    assert len(table) == len(entries)
+    assert table.to_entries() == entries
+    assert table[-1] == entries[-1]
+    assert table[10:12] == entries[10:12]
+    assert table.row(5) == entries[5]
+    assert table.row(5).payer == entries[5].payer
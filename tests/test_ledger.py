@@ -0,0 +1,51 @@
+import random
+import sqlite3
+from pathlib import Path
+
+from avc.ledger import JobLedger, load_entry
+
+from tests.factories import make_entry
+
+
+def test_ledger_keeps_matched_entry(tmp_path: Path) -> None:
+    entry = make_entry(random.Random(0), 0)
+    pdf = tmp_path / "order.pdf"
+
+    with JobLedger(tmp_path / "ledger.sqlite3") as ledger:
+        ledger.discover("abc", pdf)
+        ledger.advance("abc", "extracted")
+        ledger.advance("abc", "matched", task_id=entry.task_id, entry=entry)
+        ledger.advance("abc", "uploaded", note="Загрузка файла")
+
+    with JobLedger(tmp_path / "ledger.sqlite3") as ledger:
+        record = ledger.discover("abc", pdf)
+        assert record["state"] == "uploaded"
+        assert record["entry"]
+        assert load_entry(record["entry"]) == entry
+
+
+def test_ledger_adds_entry_column_to_old_databases(tmp_path: Path) -> None:
+    db_path = tmp_path / "ledger.sqlite3"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE jobs (
+                sha256 TEXT PRIMARY KEY,
+                network_path TEXT NOT NULL,
+                state TEXT NOT NULL,
+                task_id INTEGER,
+                note TEXT,
+                dst_path TEXT,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        conn.execute("""
+            INSERT INTO jobs
+            VALUES ('abc', 'order.pdf', 'uploaded', 1, NULL, NULL, '')
+        """)
+    conn.close()
+
+    with JobLedger(db_path) as ledger:
+        record = ledger.get("abc")
+        assert record
+        assert record["state"] == "uploaded"
+        assert record["entry"] is None
@@ -0,0 +1,26 @@
+from pathlib import Path
+
+from avc.manifest import RunManifest
+from avc.utils import Result
+
+
+def test_manifest_skips_only_terminal_outcomes(tmp_path: Path) -> None:
+    local = tmp_path / "order.pdf"
+    local.write_bytes(b"%PDF-1")
+    broken = Path("F. Платежи/1/broken.pdf")
+    failed = Path("F. Платежи/1/failed.pdf")
+
+    with RunManifest(tmp_path / "manifest.json") as manifest:
+        manifest.discover(broken, local, size=6, mtime=1.0)
+        manifest.record(broken, Result(ok=False, outcome="extraction_failed"))
+        manifest.discover(failed, local, size=6, mtime=1.0)
+        manifest.record(failed, Result(ok=False, outcome="move_failed"))
+
+    manifest = RunManifest(tmp_path / "manifest.json")
+    record = manifest.unchanged(broken, size=6, mtime=1.0)
+    assert manifest.is_terminal(record)
+    record = manifest.unchanged(failed, size=6, mtime=1.0)
+    assert not manifest.is_terminal(record)
+    assert manifest.is_failed(record)
+    # A changed file is processed again
+    assert manifest.unchanged(broken, size=7, mtime=2.0) is None
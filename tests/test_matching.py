@@ -0,0 +1,70 @@
+import random
+from datetime import datetime
+
+import pytest
+from avc.entry_table import EntryTable
+from avc.matching import (
+    EntryRangeIndex,
+    MatchTolerance,
+    find_entries,
+    find_entry,
+)
+
+from tests.factories import BINS, make_entry, make_order
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_find_entries_matches_scalar_matcher(seed: int) -> None:
+    rnd = random.Random(seed)
+    entries = [make_entry(rnd, idx) for idx in range(rnd.randint(50, 2000))]
+    orders = [make_order(rnd) for _ in range(500)]
+
+    expected = [find_entry(entries, order) for order in orders]
+
+    assert find_entries(entries, orders) == expected
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_index_over_entry_table_matches_list(seed: int) -> None:
+    rnd = random.Random(seed)
+    entries = [make_entry(rnd, idx) for idx in range(500)]
+    orders = [make_order(rnd) for _ in range(200)]
+    table = EntryTable(entries)
+    table_index = EntryRangeIndex(table)
+    list_index = EntryRangeIndex(entries)
+    tolerance = MatchTolerance(amount=0.05)
+
+    for order in orders:
+        assert find_entry(
+            table, order, index=table_index, tolerance=tolerance
+        ) == find_entry(entries, order, index=list_index, tolerance=tolerance)
+
+
+def test_find_entries_empty() -> None:
+    order = make_order(random.Random(0))
+
+    assert find_entries([], [order]) == [(None, None)]
+
+
+def test_tolerance_matching_is_opt_in() -> None:
+    rnd = random.Random(0)
+    entry = make_entry(rnd, 0)._replace(
+        contragent_bin=BINS[0], amount=1000.0, desired_date=datetime(2025, 1, 3)
+    )
+    order = make_order(rnd)._replace(
+        payer=entry.payer,
+        iin=BINS[0],
+        amount=1000.01,
+        value_date=datetime(2025, 1, 1),
+    )
+    index = EntryRangeIndex([entry])
+
+    assert find_entry([entry], order, index=index) == (None, None)
+
+    found, note = find_entry(
+        [entry], order, index=index, tolerance=MatchTolerance(amount=0.05)
+    )
+    assert found == entry
+    assert note
+    assert "0.01" in note
+    assert "2.0" in note
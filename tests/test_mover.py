@@ -0,0 +1,73 @@
+import csv
+import json
+from pathlib import Path
+
+from avc.mover import FileMover
+from avc.utils import MOVED_COLUMN, PATH_COLUMN, LogWriter
+
+
+def read_rows(file_path: Path) -> list[list[str]]:
+    with file_path.open("r", encoding="utf-8", newline="") as f:
+        return list(csv.reader(f, delimiter=";"))
+
+
+def make_record(src: Path) -> list[str]:
+    record = [""] * 16
+    record[PATH_COLUMN] = str(src)
+    return record
+
+
+def test_mover_replays_journal(tmp_path: Path) -> None:
+    src = tmp_path / "in" / "order.pdf"
+    src.parent.mkdir()
+    src.write_bytes(b"%PDF-1")
+    dst_folder = tmp_path / "out"
+    dst_folder.mkdir()
+    journal_path = tmp_path / "move_queue.json"
+
+    # Queued but never started, as if the previous run was interrupted
+    with LogWriter(tmp_path / "log.csv") as log_writer:
+        mover = FileMover(journal_path, log_writer=log_writer)
+        mover.submit(src, dst_folder / src.name, make_record(src), key="abc")
+    assert len(json.loads(journal_path.read_text(encoding="utf-8"))) == 1
+
+    moved: list[tuple[str, Path]] = []
+    with (
+        LogWriter(tmp_path / "log.csv") as log_writer,
+        FileMover(
+            journal_path,
+            log_writer=log_writer,
+            on_moved=lambda key, dst: moved.append((key, dst)),
+        ) as mover,
+    ):
+        mover.join()
+
+        assert (dst_folder / src.name).exists()
+        assert not src.exists()
+        assert moved == [("abc", dst_folder / src.name)]
+        assert json.loads(journal_path.read_text(encoding="utf-8")) == []
+
+    rows = read_rows(tmp_path / "log.csv")
+    assert [(row[PATH_COLUMN], row[MOVED_COLUMN]) for row in rows] == [
+        (str(dst_folder / src.name), "Да")
+    ]
+
+
+def test_mover_reports_missing_source(tmp_path: Path) -> None:
+    src = tmp_path / "order.pdf"
+    dst = tmp_path / "out" / "order.pdf"
+
+    with (
+        LogWriter(tmp_path / "log.csv") as log_writer,
+        FileMover(tmp_path / "move_queue.json", log_writer=log_writer) as mover,
+    ):
+        mover.submit(src, dst, make_record(src))
+        mover.join()
+
+        assert [path for path, _ in mover.failed] == [src]
+        assert mover.failed[0][1].outcome == "move_failed"
+
+    rows = read_rows(tmp_path / "log.csv")
+    assert [(row[PATH_COLUMN], row[MOVED_COLUMN]) for row in rows] == [
+        (str(src), "Нет")
+    ]
@@ -0,0 +1,83 @@
+import random
+import threading
+import time
+
+from avc.pipeline import Pipeline, Stage
+
+
+def jitter(item: int) -> int:
+    time.sleep(random.Random(item).random() / 100)
+    return item
+
+
+def test_pipeline_keeps_source_order() -> None:
+    seen: list[int] = []
+    pipeline = Pipeline(
+        [
+            Stage("work", jitter, workers=4),
+            Stage("collect", seen.append, ordered=True),
+        ]
+    )
+
+    pipeline.run(range(50))
+
+    assert seen == list(range(50))
+    assert pipeline.stages[0].processed == 50
+
+
+def test_pipeline_passes_failures_downstream() -> None:
+    def work(item: int) -> int:
+        if item == 3:
+            raise ValueError("broken item")
+        return item
+
+    seen: list[int | str] = []
+    pipeline = Pipeline(
+        [
+            Stage(
+                "work",
+                work,
+                workers=2,
+                on_error=lambda item, e: f"{item}: {e}",
+            ),
+            Stage("collect", seen.append, ordered=True),
+        ]
+    )
+
+    pipeline.run(range(6))
+
+    assert seen == [0, 1, 2, "3: broken item", 4, 5]
+    assert pipeline.stages[0].failed == 1
+
+
+def test_pipeline_drops_failures_without_handler() -> None:
+    def work(item: int) -> int:
+        if item % 2:
+            raise ValueError("broken item")
+        return item
+
+    seen: list[int] = []
+    pipeline = Pipeline(
+        [
+            Stage("work", work, workers=2),
+            Stage("collect", seen.append, ordered=True),
+        ]
+    )
+
+    pipeline.run(range(6))
+
+    assert seen == [0, 2, 4]
+
+
+def test_pipeline_runs_inline_stage_on_calling_thread() -> None:
+    threads: set[str] = set()
+
+    def work(item: int) -> int:
+        threads.add(threading.current_thread().name)
+        return item
+
+    pipeline = Pipeline([Stage("inline", work, inline=True)])
+
+    pipeline.run(range(5))
+
+    assert threads == {threading.current_thread().name}
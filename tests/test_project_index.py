@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import override
+
+from avc.project_index import ProjectIndex
+from avc.storage import LocalStorage, StorageEntry
+
+
+class CountingStorage(LocalStorage):
+    def __init__(self) -> None:
+        self.listed: list[Path] = []
+
+    @override
+    def listdir(self, path: Path | str) -> list[StorageEntry]:
+        self.listed.append(Path(path))
+        return super().listdir(path)
+
+
+def make_tree(root: Path) -> None:
+    for folder in ["001-25 Офис", "002-25 Склад"]:
+        (root / "Алматы" / folder).mkdir(parents=True)
+    (root / "Астана" / "003-25 Цех").mkdir(parents=True)
+
+
+def test_project_index_finds_and_misses(tmp_path: Path) -> None:
+    root = tmp_path / "2025"
+    make_tree(root)
+
+    with ProjectIndex(tmp_path / "index.json") as index:
+        assert index.find_project(root, "002-25") == (
+            root / "Алматы" / "002-25 Склад"
+        )
+        assert index.find_project(root, "003-25") == (
+            root / "Астана" / "003-25 Цех"
+        )
+        assert index.find_project(root, "004-25") is None
+
+
+def test_project_index_refresh_lists_only_changed_folders(
+    tmp_path: Path,
+) -> None:
+    root = tmp_path / "2025"
+    make_tree(root)
+    with ProjectIndex(tmp_path / "index.json") as index:
+        index.refresh(root)
+
+    storage = CountingStorage()
+    with ProjectIndex(tmp_path / "index.json", storage=storage) as index:
+        index.refresh(root)
+        # The last level is taken from the cache
+        assert sorted(storage.listed) == [
+            root,
+            root / "Алматы",
+            root / "Астана",
+        ]
+
+    new_project = root / "Астана" / "004-25 Гараж"
+    new_project.mkdir()
+    storage = CountingStorage()
+    with ProjectIndex(tmp_path / "index.json", storage=storage) as index:
+        assert index.find_project(root, "004-25") == new_project
+        assert root / "Астана" / "003-25 Цех" not in storage.listed
+        assert root / "Алматы" / "001-25 Офис" not in storage.listed
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Any, cast
+
+import pytest
+from avc.pyrus_api import PyrusApiClient, get_upload_client
+from avc.pyrus_client import Credentials
+
+
+class FakeWebClient:
+    def __init__(self) -> None:
+        self.threads: set[str] = set()
+        self.uploads: list[tuple[int, str]] = []
+
+    def login(self) -> None:
+        self.threads.add(threading.current_thread().name)
+
+    def upload_file(self, task_id: int, file_path: Path) -> str | None:
+        self.threads.add(threading.current_thread().name)
+        self.uploads.append((task_id, file_path.name))
+        return None
+
+    def is_driver_running(self) -> bool:
+        return True
+
+    def __exit__(self, *_: object) -> bool:
+        return False
+
+
+def test_browser_fallback_stays_on_one_thread(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("UPLOAD_BACKEND", "api")
+    web_client = FakeWebClient()
+    client = get_upload_client(
+        Credentials("robot@example.com", "password", 1),
+        cast("Any", web_client),
+    )
+    assert isinstance(client, PyrusApiClient)
+
+    with client:
+        workers = [
+            threading.Thread(
+                target=client.upload_with_browser,
+                args=(task_id, Path("order.pdf")),
+            )
+            for task_id in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    assert web_client.threads == {"browser-0"}
+    assert sorted(web_client.uploads) == [
+        (task_id, "order.pdf") for task_id in range(4)
+    ]
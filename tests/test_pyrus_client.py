@@ -0,0 +1,71 @@
+from pathlib import Path
+from typing import Any
+
+import pytest
+import requests
+from avc.pyrus_client import (
+    ATTACHMENT_FIELD_ID,
+    TaskStateIndex,
+    check_response,
+)
+
+
+def make_response(status: int, body: bytes) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    return response
+
+
+def test_check_response_accepts_result() -> None:
+    response = make_response(200, '\ufeff{"d": {"TaskId": 1}}'.encode())
+
+    assert check_response(response) == {"TaskId": 1}
+
+
+@pytest.mark.parametrize(
+    ("status", "body"),
+    [
+        (500, b'{"d": {}}'),
+        (200, b"<html>login</html>"),
+        (200, b'{"Message": "Fault"}'),
+        (200, b'{"d": {"Error": "Access denied"}}'),
+        (200, b'{"d": {"ErrorCode": 4}}'),
+    ],
+)
+def test_check_response_rejects_errors(status: int, body: bytes) -> None:
+    with pytest.raises(requests.HTTPError):
+        check_response(make_response(status, body))
+
+
+def make_form(task_id: int, files: list[tuple[str, int]]) -> Any:
+    return {
+        "TaskId": task_id,
+        "Fields": [
+            {
+                "FieldId": ATTACHMENT_FIELD_ID,
+                "ExistingFiles": [
+                    {"Name": name, "Size": size} for name, size in files
+                ],
+            },
+        ],
+    }
+
+
+def test_task_states_find_attached_files(tmp_path: Path) -> None:
+    pdf = tmp_path / "order.pdf"
+    pdf.write_bytes(b"%PDF-1")
+    task_states = TaskStateIndex()
+    task_states.add_forms(
+        [
+            make_form(1, [("order.pdf", 6)]),
+            make_form(2, [("order.pdf", 7)]),
+            make_form(3, []),
+        ]
+    )
+
+    assert task_states.is_attached(1, pdf)
+    # A file with the same name but another size is a different file
+    assert not task_states.is_attached(2, pdf)
+    assert not task_states.is_attached(3, pdf)
+    assert not task_states.is_attached(4, pdf)
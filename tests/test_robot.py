@@ -0,0 +1,109 @@
+import random
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+# The robot drives the desktop browser, it imports pywinauto at module level
+pytest.importorskip("pywinauto")
+
+from avc.avc_pay_robot import (
+    PaymentJob,
+    discover_step,
+    extract_jobs,
+    match_step,
+)
+from avc.ledger import JobLedger
+from avc.matching import EntryRangeIndex, MatchTolerance
+from avc.utils import LogWriter
+
+from tests.factories import make_entry, make_order
+
+
+def make_job(tmp_path: Path) -> PaymentJob:
+    pdf = tmp_path / "order.pdf"
+    pdf.write_bytes(b"%PDF-1")
+    job = PaymentJob(network_file_path=pdf, local_file_path=pdf)
+    job.order = make_order(random.Random(0))
+    return job
+
+
+def test_match_step_uses_batch_match(tmp_path: Path) -> None:
+    entry = make_entry(random.Random(0), 0)
+    job = make_job(tmp_path)
+    job.match = (entry, None)
+
+    with LogWriter(tmp_path / "log.csv") as log_writer:
+        job = match_step(job, log_writer, entries=[], processed_tasks=set())
+
+    assert job.result is None
+    assert job.entry == entry
+
+
+def test_match_step_retries_batch_miss_with_tolerance(tmp_path: Path) -> None:
+    job = make_job(tmp_path)
+    assert job.order
+    entry = make_entry(random.Random(0), 0)._replace(
+        payer=job.order.payer,
+        contragent_bin=job.order.iin,
+        amount=job.order.amount + 0.01,
+        desired_date=job.order.value_date,
+    )
+    job.match = (None, None)
+
+    with LogWriter(tmp_path / "log.csv") as log_writer:
+        job = match_step(
+            job,
+            log_writer,
+            entries=[entry],
+            processed_tasks=set(),
+            index=EntryRangeIndex([entry]),
+            tolerance=MatchTolerance(amount=0.05, relative_amount=0, days=7),
+        )
+
+    assert job.entry == entry
+    assert job.match_note
+
+
+def test_extract_jobs_keeps_failed_files(tmp_path: Path) -> None:
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+    missing = tmp_path / "missing.pdf"
+
+    with (
+        LogWriter(tmp_path / "log.csv") as log_writer,
+        JobLedger(tmp_path / "ledger.sqlite3") as ledger,
+    ):
+        jobs = extract_jobs(
+            [(broken, broken, None), (missing, missing, None)],
+            log_writer,
+            datetime(2025, 10, 31),
+            ledger=ledger,
+        )
+
+        assert [job.network_file_path for job in jobs] == [broken, missing]
+        assert [
+            job.result.outcome for job in jobs if job.result is not None
+        ] == [
+            "extraction_failed",
+            "step_failed",
+        ]
+        assert all(job.record for job in jobs)
+
+
+def test_discover_step_reuses_manifest_digest(tmp_path: Path) -> None:
+    # The file is gone, only a digest carried from the manifest can be used
+    missing = tmp_path / "missing.pdf"
+    job = PaymentJob(missing, missing, sha256="abc")
+
+    with (
+        LogWriter(tmp_path / "log.csv") as log_writer,
+        JobLedger(tmp_path / "ledger.sqlite3") as ledger,
+    ):
+        job = discover_step(job, log_writer, ledger)
+
+        assert job.result is None
+        assert job.state == "discovered"
+        record = ledger.get("abc")
+        assert record
+        assert record["network_path"] == str(missing)
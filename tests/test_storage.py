@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import shutil
+import threading
+from collections.abc import Iterator
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import override
+from urllib.parse import quote, unquote, urlsplit
+
+import pytest
+from avc.storage import WebDavStorage
+
+ROOT = Path("/share")
+
+
+class DavHandler(BaseHTTPRequestHandler):
+    @property
+    def dav(self) -> DavServer:
+        assert isinstance(self.server, DavServer)
+        return self.server
+
+    @override
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+    def local(self, url: str) -> Path:
+        path = unquote(urlsplit(url).path).strip("/")
+        return self.dav.root.joinpath(*path.split("/")[1:])
+
+    def reply(self, status: int, body: bytes = b"") -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PROPFIND(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.dav.fail:
+            self.reply(503)
+            return
+        path = self.local(self.path)
+        if not path.exists():
+            self.reply(404)
+            return
+        items = [path]
+        if self.headers.get("Depth") == "1" and path.is_dir():
+            items.extend(sorted(path.iterdir()))
+        responses = []
+        for item in items:
+            rel = item.relative_to(self.dav.root).parts
+            href = "/".join(["/dav", *(quote(part) for part in rel)])
+            st = item.stat()
+            kind = "<d:collection/>" if item.is_dir() else ""
+            response = (
+                f"<d:response><d:href>{href}</d:href><d:propstat><d:prop>"
+                f"<d:resourcetype>{kind}</d:resourcetype>"
+                f"<d:getcontentlength>{st.st_size}</d:getcontentlength>"
+                "<d:getlastmodified>"
+                f"{formatdate(st.st_mtime, usegmt=True)}"
+                "</d:getlastmodified>"
+                "</d:prop></d:propstat></d:response>"
+            )
+            responses.append(response)
+        body = (
+            '<?xml version="1.0"?><d:multistatus xmlns:d="DAV:">'
+            f"{''.join(responses)}</d:multistatus>"
+        )
+        self.reply(207, body.encode("utf-8"))
+
+    def do_GET(self) -> None:
+        path = self.local(self.path)
+        if not path.is_file():
+            self.reply(404)
+            return
+        self.reply(200, path.read_bytes())
+
+    def do_PUT(self) -> None:
+        path = self.local(self.path)
+        if not path.parent.is_dir():
+            self.reply(409)
+            return
+        path.write_bytes(self.rfile.read(int(self.headers["Content-Length"])))
+        self.reply(201)
+
+    def do_MKCOL(self) -> None:
+        path = self.local(self.path)
+        if path.exists():
+            self.reply(405)
+            return
+        if not path.parent.is_dir():
+            self.reply(409)
+            return
+        path.mkdir()
+        self.reply(201)
+
+    def do_MOVE(self) -> None:
+        src = self.local(self.path)
+        dst = self.local(self.headers["Destination"])
+        if not src.exists():
+            self.reply(404)
+            return
+        if not dst.parent.is_dir():
+            self.reply(409)
+            return
+        shutil.move(src, dst)
+        self.reply(201)
+
+
+class DavServer(ThreadingHTTPServer):
+    def __init__(self, root: Path) -> None:
+        super().__init__(("127.0.0.1", 0), DavHandler)
+        self.root: Path = root
+        self.fail: bool = False
+
+
+@pytest.fixture
+def dav(tmp_path: Path) -> Iterator[tuple[DavServer, WebDavStorage]]:
+    server = DavServer(tmp_path / "share")
+    server.root.mkdir()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    storage = WebDavStorage(
+        f"http://{host!s}:{port}/dav", "user", "password", root=ROOT, timeout=5
+    )
+    with storage:
+        yield server, storage
+    server.shutdown()
+    server.server_close()
+
+
+def test_webdav_listing_and_relocation(
+    dav: tuple[DavServer, WebDavStorage], tmp_path: Path
+) -> None:
+    server, storage = dav
+    (server.root / "1").mkdir()
+    (server.root / "1" / "платежка 1.pdf").write_bytes(b"%PDF-1")
+
+    entries = storage.listdir(ROOT / "1")
+    assert [(e.name, e.is_dir, e.size) for e in entries] == [
+        ("платежка 1.pdf", False, 6)
+    ]
+    assert storage.exists(ROOT / "1")
+    assert storage.stat(ROOT / "2") is None
+
+    local = tmp_path / "local.pdf"
+    storage.copy_to_local(ROOT / "1" / "платежка 1.pdf", local)
+    assert local.read_bytes() == b"%PDF-1"
+
+    folder = ROOT / "Проект" / "Финансовые документы"
+    storage.mkdir(folder)
+    storage.mkdir(folder)
+    storage.move(ROOT / "1" / "платежка 1.pdf", folder / "платежка 1.pdf")
+    assert [e.name for e in storage.listdir(folder)] == ["платежка 1.pdf"]
+    assert storage.listdir(ROOT / "1") == []
+
+    storage.copy_from_local(local, ROOT / "1" / "копия.pdf")
+    assert (server.root / "1" / "копия.pdf").read_bytes() == b"%PDF-1"
+
+
+def test_webdav_errors_are_os_errors(
+    dav: tuple[DavServer, WebDavStorage], tmp_path: Path
+) -> None:
+    server, storage = dav
+
+    with pytest.raises(FileNotFoundError):
+        storage.listdir(ROOT / "missing")
+    with pytest.raises(FileNotFoundError):
+        storage.copy_to_local(ROOT / "missing.pdf", tmp_path / "x.pdf")
+    (server.root / "a.pdf").write_bytes(b"%PDF-1")
+    with pytest.raises(OSError):
+        storage.move(ROOT / "a.pdf", ROOT / "no" / "a.pdf")
+
+    server.fail = True
+    with pytest.raises(OSError):
+        storage.listdir(ROOT)
+
+    server.shutdown()
+    server.server_close()
+    with pytest.raises(OSError):
+        storage.copy_to_local(ROOT / "a.pdf", tmp_path / "a.pdf")
@@ -0,0 +1,78 @@
+import csv
+import random
+from datetime import date
+from pathlib import Path
+
+from avc.storage import LocalStorage
+from avc.utils import TASK_URL_PREFIX, LogWriter, ProcessedTaskIndex
+
+from tests.factories import make_entry
+
+
+def read_rows(file_path: Path) -> list[list[str]]:
+    with file_path.open("r", encoding="utf-8", newline="") as f:
+        return list(csv.reader(f, delimiter=";"))
+
+
+def test_log_writer_skips_duplicate_rows(tmp_path: Path) -> None:
+    file_path = tmp_path / "log.csv"
+    entry = make_entry(random.Random(0), 0)
+
+    with LogWriter(file_path) as log_writer:
+        for _ in range(2):
+            log_writer.append_record(
+                pdf_file_path=Path("order.pdf"),
+                note="Успех",
+                entry=entry,
+                found_in_pyrus=True,
+            )
+        log_writer.append_record(pdf_file_path=Path("other.pdf"), note="Ошибка")
+
+    # A rerun reads the rows back and still writes each of them once
+    with LogWriter(file_path) as log_writer:
+        log_writer.append_record(
+            pdf_file_path=Path("order.pdf"),
+            note="Успех",
+            entry=entry,
+            found_in_pyrus=True,
+        )
+
+    rows = read_rows(file_path)
+    assert [row[11] for row in rows] == ["order.pdf", "other.pdf"]
+    assert rows[0][0] == f"{TASK_URL_PREFIX}{entry.task_id}"
+    assert file_path.with_suffix(".xlsx").exists()
+
+
+def test_log_writer_publishes_through_storage(tmp_path: Path) -> None:
+    publish_folder = tmp_path / "Логи"
+    publish_folder.mkdir()
+    file_path = tmp_path / "2025.03.05.csv"
+
+    with LogWriter(
+        file_path, publish_folder=publish_folder, storage=LocalStorage()
+    ) as log_writer:
+        log_writer.append_record(pdf_file_path=Path("order.pdf"), note="Успех")
+
+    assert (publish_folder / "2025.03.05.xlsx").exists()
+
+
+def test_processed_tasks_expire_after_lookback(tmp_path: Path) -> None:
+    file_path = tmp_path / "processed.txt"
+    file_path.write_text(
+        "1;2025-01-01\n2;2025-01-01\n3;2025-01-01\n4;2025-03-01\n",
+        encoding="utf-8",
+    )
+
+    tasks = ProcessedTaskIndex(
+        file_path, today=date(2025, 3, 5), lookback_days=30
+    )
+    tasks.add(5)
+    tasks.add(4)
+
+    assert 4 in tasks
+    assert 1 not in tasks
+    assert len(tasks) == 2
+    assert file_path.read_text(encoding="utf-8").splitlines() == [
+        "4;2025-03-01",
+        "5;2025-03-05",
+    ]